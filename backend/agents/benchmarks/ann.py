@@ -0,0 +1,69 @@
+"""
+Recall@k and latency of the ANN index types against the flat baseline.
+
+Synthetic clustered vectors stand in for chunk embeddings (unit-normalised,
+--clusters Gaussian blobs); queries are perturbed corpus vectors. Each index
+type is built through tools.ann.build_index with the current ANN_* settings.
+
+    python -m benchmarks.ann --chunks 100000 --dim 768 --k 10
+    ANN_NPROBE=32 python -m benchmarks.ann --types ivf sq8
+"""
+import argparse
+import time
+
+import numpy as np
+
+from tools import ann
+
+
+def _data(n: int, d: int, clusters: int, queries: int):
+    rng = np.random.default_rng(0)
+    centres = rng.standard_normal((clusters, d)).astype(np.float32)
+    xb = centres[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, d)).astype(np.float32)
+    xb /= np.linalg.norm(xb, axis=1, keepdims=True)
+    xq = xb[rng.integers(0, n, queries)] + 0.05 * rng.standard_normal((queries, d)).astype(np.float32)
+    xq /= np.linalg.norm(xq, axis=1, keepdims=True)
+    return xb, xq.astype(np.float32)
+
+
+def main():
+    import faiss
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=list(ann.INDEX_TYPES))
+    args = parser.parse_args()
+
+    xb, xq = _data(args.chunks, args.dim, args.clusters, args.queries)
+    print(f"chunks={args.chunks} dim={args.dim} queries={args.queries} k={args.k} "
+          f"auto -> {ann.choose_type(args.chunks, 'auto')}")
+    print("type     build s   size MB   recall@k   ms/query (1 thread)   ms/query (batch)")
+
+    faiss.omp_set_num_threads(1)
+    truth = None
+    for kind in ["flat"] + [t for t in args.types if t != "flat"]:
+        t0 = time.perf_counter()
+        index = ann.build_index(xb, faiss.METRIC_L2, kind)
+        build_s = time.perf_counter() - t0
+        size_mb = faiss.serialize_index(index).nbytes / 1e6
+
+        t0 = time.perf_counter()
+        for q in xq:
+            _, found = index.search(q[None, :], args.k)
+        single_ms = (time.perf_counter() - t0) / len(xq) * 1000
+        t0 = time.perf_counter()
+        _, found = index.search(xq, args.k)
+        batch_ms = (time.perf_counter() - t0) / len(xq) * 1000
+
+        if truth is None:
+            truth = found
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(found, truth)])
+        print(f"{kind:<7} {build_s:8.2f}  {size_mb:8.1f}  {recall:9.3f}  {single_ms:20.3f}  {batch_ms:17.3f}")
+
+
+if __name__ == "__main__":
+    main()
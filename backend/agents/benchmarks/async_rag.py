@@ -0,0 +1,167 @@
+"""
+Concurrent Qdrant RAG requests on one event loop: sync vs async entry point.
+
+Runs --requests questions at once from coroutines, the way ADK runs
+execute_rag_pipeline. The sync path calls run_qdrant_rag inline, which is what
+the agent tools did. The async path awaits arun_qdrant_rag. While the
+requests run, a ticker coroutine stands in for another user's SSE stream;
+its worst gap shows how long the loop was blocked.
+
+Gemini is replaced by stand-ins with fixed latencies (--embed-ms for the
+query embedding, --llm-ms for the answer), and PII redaction is skipped, so
+only the I/O scheduling is measured. Qdrant is the in-process client (one
+sync and one async instance filled with the same points) unless
+--server is given.
+
+    python -m benchmarks.async_rag --requests 32 --llm-ms 800
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from tools import QdrantRAG
+
+DIM = 768
+
+
+class _SlowEmbeddings(Embeddings):
+    dim = DIM
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def _vector(self, text: str) -> list:
+        seed = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).random(DIM).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        time.sleep(self.delay)
+        return self._vector(text)
+
+    async def aembed_query(self, text):
+        await asyncio.sleep(self.delay)
+        return self._vector(text)
+
+
+def _slow_chat(responses: list, delay: float):
+    """Chat model stand-in: blocking sleep on invoke, asyncio.sleep on ainvoke."""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    class SlowChat(FakeListChatModel):
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            await asyncio.sleep(self.sleep)
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.responses[0]))])
+
+    return SlowChat(responses=responses, sleep=delay)
+
+
+async def _ticker(gaps: list, stop: asyncio.Event, interval: float = 0.01):
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        gaps.append(now - last - interval)
+        last = now
+
+
+async def _run(mode: str, path: str, n: int):
+    gaps, stop = [], asyncio.Event()
+    ticker = asyncio.create_task(_ticker(gaps, stop))
+    await asyncio.sleep(0.05)
+
+    async def one(i):
+        if mode == "sync":
+            return QdrantRAG.run_qdrant_rag(path, f"question {i}")
+        return await QdrantRAG.arun_qdrant_rag(path, f"question {i}")
+
+    t0 = time.perf_counter()
+    answers = await asyncio.gather(*(one(i) for i in range(n)))
+    seconds = time.perf_counter() - t0
+    stop.set()
+    await ticker
+    assert all(a == "stub answer" for a in answers), answers[:1]
+    return seconds, max(gaps) * 1000
+
+
+def main():
+    from qdrant_client import AsyncQdrantClient, QdrantClient
+    from qdrant_client.models import Distance, PointStruct, VectorParams
+    from tools import RAG
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--embed-ms", type=float, default=100)
+    parser.add_argument("--llm-ms", type=float, default=800)
+    parser.add_argument("--server", action="store_true", help="use QDRANT_HOST instead of in-process")
+    args = parser.parse_args()
+
+    embeddings = _SlowEmbeddings(args.embed_ms / 1000)
+    RAG.make_embeddings = lambda: embeddings
+    RAG.finish_answer = lambda text: text
+    QdrantRAG._make_llm = lambda: _slow_chat(["stub answer"], args.llm_ms / 1000)
+
+    if args.server:
+        if QdrantRAG._init_qdrant() is None:
+            raise SystemExit("Qdrant unreachable")
+    else:
+        QdrantRAG._qdrant_client = QdrantClient(":memory:")
+    client = QdrantRAG._qdrant_client
+
+    fd, path = tempfile.mkstemp(suffix=".pdf", prefix="bench_")
+    os.write(fd, b"async benchmark document")
+    os.close(fd)
+    doc_hash = QdrantRAG.index_key(path)
+    coll = QdrantRAG._collection_name(path, doc_hash)
+    points = [
+        PointStruct(id=QdrantRAG.point_id(doc_hash, i), vector=embeddings._vector(f"chunk {i}"),
+                    payload={"page_content": f"chunk {i} " * 30, "metadata": {"doc_hash": doc_hash},
+                             "complete": True})
+        for i in range(200)
+    ]
+
+    async def setup_async():
+        if args.server:
+            return await QdrantRAG._init_async_qdrant()
+        aclient = AsyncQdrantClient(":memory:")
+        await aclient.create_collection(coll, vectors_config=VectorParams(size=DIM, distance=Distance.COSINE))
+        await aclient.upsert(coll, points=points)
+        QdrantRAG._async_qdrant_client = aclient
+        return aclient
+
+    async def bench():
+        await setup_async()
+        results = {}
+        for mode in ("sync", "async"):
+            results[mode] = await _run(mode, path, args.requests)
+        return results
+
+    try:
+        client.create_collection(coll, vectors_config=VectorParams(size=DIM, distance=Distance.COSINE))
+        client.upsert(coll, points=points)
+        QdrantRAG._get_or_build_qdrant_index(path, embeddings)  # warm the readiness registry
+
+        results = asyncio.run(bench())
+        print(f"requests={args.requests} embed={args.embed_ms:.0f} ms llm={args.llm_ms:.0f} ms "
+              f"qdrant={'server' if args.server else 'in-process'}")
+        print("path    seconds   req/s   worst loop stall ms")
+        for mode, (seconds, stall) in results.items():
+            print(f"{mode:<6} {seconds:8.2f}  {args.requests / seconds:6.1f}  {stall:12.0f}")
+    finally:
+        client.delete_collection(coll)
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Recursive character splitter vs structure-aware chunker.
+
+Chunking throughput (pages/s, chunks/s) over the knowledge base, then
+retrieval hit rate@k on the research-paper eval set: the fraction of relevant
+statements covered by one of the top-k chunks. Ranking is BM25 by default so
+the run is offline; --embeddings gemini ranks by embedding similarity instead.
+
+    python -m benchmarks.chunking --k 4
+    python -m benchmarks.chunking --embeddings gemini
+"""
+import argparse
+import os
+
+from benchmarks.common import EVAL_SET, KNOWLEDGE_BASE, bm25_rank, is_hit, knowledge_base_pdfs, timed
+from tools import ingest
+
+CHUNKERS = ("recursive", "structured")
+
+
+def _no_redaction(texts: list) -> list:
+    return texts
+
+
+def _chunk(path: str, chunker: str) -> list:
+    return ingest.load_and_chunk(path, _no_redaction, workers=1, chunker=chunker)
+
+
+def _embedding_rank():
+    import numpy as np
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    emb = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
+
+    def rank(query: str, texts: list) -> list:
+        docs = np.array(emb.embed_documents(texts))
+        q = np.array(emb.embed_query(query))
+        scores = docs @ q / (np.linalg.norm(docs, axis=1) * np.linalg.norm(q) + 1e-9)
+        return list(np.argsort(-scores))
+
+    return rank
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--embeddings", choices=("bm25", "gemini"), default="bm25")
+    args = parser.parse_args()
+
+    pdfs = knowledge_base_pdfs()
+    pages = sum(ingest.page_count(p) for p in pdfs)
+    rank = bm25_rank if args.embeddings == "bm25" else _embedding_rank()
+
+    print(f"pdfs={len(pdfs)} pages={pages} k={args.k} ranking={args.embeddings}")
+    print("chunker      seconds   pages/s  chunks/s  chunks  avg chars  hit@k")
+    for chunker in CHUNKERS:
+        per_file, seconds = timed(
+            lambda: {os.path.basename(p): _chunk(p, chunker) for p in pdfs},
+            repeat=args.repeat,
+        )
+        n_chunks = sum(len(c) for c in per_file.values())
+        avg_chars = sum(len(d.page_content) for c in per_file.values() for d in c) / max(1, n_chunks)
+
+        hits = total = 0
+        for name, query, relevant in EVAL_SET:
+            texts = [d.page_content for d in per_file[name]]
+            top = [texts[i] for i in rank(query, texts)[:args.k]]
+            hits += sum(any(is_hit(s, t) for t in top) for s in relevant)
+            total += len(relevant)
+
+        print(f"{chunker:<11} {seconds:8.3f}  {pages / seconds:8.1f}  {n_chunks / seconds:8.1f}  "
+              f"{n_chunks:6d}  {avg_chars:9.0f}  {hits / total:5.1%}")
+    print(f"\nknowledge base: {KNOWLEDGE_BASE}")
+
+
+if __name__ == "__main__":
+    main()
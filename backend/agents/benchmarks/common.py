@@ -0,0 +1,132 @@
+"""Shared helpers for the benchmark scripts (run from backend/agents)."""
+import math
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+KNOWLEDGE_BASE = os.path.abspath(
+    os.path.join(_HERE, "..", "..", "..", "research-paper", "Knowledge-Base")
+)
+
+
+def knowledge_base_pdfs() -> list:
+    return sorted(
+        os.path.join(KNOWLEDGE_BASE, f)
+        for f in os.listdir(KNOWLEDGE_BASE)
+        if f.lower().endswith(".pdf")
+    )
+
+
+def synthetic_pdf(pages: int, sources=None) -> str:
+    """Concatenate the knowledge-base PDFs until *pages* pages are reached."""
+    import fitz
+
+    sources = sources or knowledge_base_pdfs()
+    out = fitz.open()
+    while out.page_count < pages:
+        for src in sources:
+            with fitz.open(src) as doc:
+                out.insert_pdf(doc, to_page=min(doc.page_count, pages - out.page_count) - 1)
+            if out.page_count >= pages:
+                break
+    fd, path = tempfile.mkstemp(suffix=".pdf", prefix="bench_")
+    os.close(fd)
+    out.save(path)
+    out.close()
+    return path
+
+
+def timed(fn, *args, repeat: int = 1, **kwargs):
+    """Run *fn* *repeat* times; return (last result, best wall-clock seconds)."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+# Retrieval eval set from research-paper/main.py: (file, query, relevant statements).
+EVAL_SET = [
+    ("nda.pdf",
+     "What are the obligations of the Receiving Party under the NDA?",
+     ["The Receiving Party shall refrain from disclosing Confidential Information.",
+      "The Parties shall protect the confidentiality of each other's Confidential Information.",
+      "Within seven (7) days of a written request the Receiving Party shall return/destroy Confidential Information.",
+      "The Receiving Party may disclose Confidential Information to the extent required by law."]),
+    ("extended_rental_agreement.pdf",
+     "What actions can the landlord take if the tenant violates the agreement?",
+     ["Non-payment for 15 days constitutes a material breach and triggers eviction proceedings.",
+      "Violation results in immediate lease termination.",
+      "Landlord remedies include lease termination and eviction filing.",
+      "Withholding security deposit."]),
+    ("finance_docs.pdf",
+     "What is the total net portfolio value at the end of the statement period?",
+     ["Total Net Portfolio Value $1,483,680.50",
+      "Statement Period: December 1, 2025 – December 31, 2025",
+      "Market Change +$28,450.50"]),
+    ("education_docs.pdf",
+     "Why are AI guardrails necessary in large language model systems?",
+     ["AI Guardrails are mechanisms designed to keep AI systems operating within safe boundaries.",
+      "Preventing the generation of hate speech, violence, and self-harm content.",
+      "Data Privacy: Ensuring the model does not leak Personally Identifiable Information.",
+      "Hallucination Detection checks generated facts."]),
+    ("nda.pdf",
+     "How does the NDA manage confidentiality risks between the parties?",
+     ["The Receiving Party shall refrain from disclosing Confidential Information.",
+      "The Parties shall protect the confidentiality of each other's Confidential Information.",
+      "Confidential Information shall at all times remain the property of the Disclosing Party.",
+      "The non-breaching party is entitled to seek injunctive relief."]),
+    ("extended_rental_agreement.pdf",
+     "What risk mitigation steps does the rental agreement impose on the tenant?",
+     ["Premises shall be used solely for residential purposes.",
+      "Pets are strictly prohibited.",
+      "Events of default include rent unpaid for 10+ days.",
+      "Tenant indemnifies the Landlord against damages."]),
+    ("finance_docs.pdf",
+     "What financial risk disclosures or safeguards are included in the statement?",
+     ["Asset Allocation: US Equities, Fixed Income, Cash, Alternative Investments.",
+      "Year-to-Date (YTD) Returns vs Benchmark.",
+      "This document is a mockup for educational and formatting purposes only.",
+      "Past performance is not indicative of future results."]),
+    ("education_docs.pdf",
+     "How do AI guardrails reduce operational and ethical risks?",
+     ["AI Guardrails are mechanisms, rules, and filters designed to keep AI systems operating safely.",
+      "Preventing the generation of hate speech, violence, self-harm content.",
+      "Data Privacy: Ensuring the model does not leak Personally Identifiable Information.",
+      "Hallucination Detection checks generated facts."]),
+]
+
+_WORD_RE = re.compile(r"[a-z0-9$]+(?:[.,][0-9]+)*")
+
+
+def tokens(text: str) -> list:
+    return _WORD_RE.findall(text.lower())
+
+
+def is_hit(statement: str, chunk: str, threshold: float = 0.6) -> bool:
+    """A chunk covers a (paraphrased) statement when most of its words occur in it."""
+    want = set(tokens(statement))
+    return bool(want) and len(want & set(tokens(chunk))) / len(want) >= threshold
+
+
+def bm25_rank(query: str, texts: list, k1: float = 1.5, b: float = 0.75) -> list:
+    """Indices of *texts* ordered by BM25 score for *query* (offline retrieval)."""
+    docs = [tokens(t) for t in texts]
+    avg = sum(len(d) for d in docs) / max(1, len(docs))
+    df = Counter(w for d in docs for w in set(d))
+    n = len(docs)
+    scores = []
+    for d in docs:
+        tf = Counter(d)
+        s = 0.0
+        for w in set(tokens(query)):
+            if w in tf:
+                idf = math.log(1 + (n - df[w] + 0.5) / (df[w] + 0.5))
+                s += idf * tf[w] * (k1 + 1) / (tf[w] + k1 * (1 - b + b * len(d) / avg))
+        scores.append(s)
+    return sorted(range(n), key=lambda i: -scores[i])
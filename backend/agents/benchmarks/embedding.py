@@ -0,0 +1,108 @@
+"""
+Embedding throughput against a local fake embedding endpoint.
+
+Starts an HTTP server that answers POST /embed {"texts": [...]} after
+--latency-ms + --per-text-ms * len(texts), and fails --fail-rate of requests
+with 429. Compares one request per chunk (the old research-paper loop) with
+EmbeddingExecutor batches at increasing concurrency, and checks that the
+executor returns vectors in input order.
+
+    python -m benchmarks.embedding --chunks 2000 --fail-rate 0.05
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.common import timed
+from tools.embedding_executor import EmbeddingExecutor
+
+DIM = 64
+
+
+def _fake_vector(text: str) -> list:
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [b / 255 for b in (digest * (DIM // len(digest) + 1))[:DIM]]
+
+
+def _serve(latency: float, per_text: float, fail_rate: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            texts = body["texts"]
+            time.sleep(latency + per_text * len(texts))
+            if random.random() < fail_rate:
+                self.send_response(429)
+                self.end_headers()
+                return
+            out = json.dumps({"embeddings": [_fake_vector(t) for t in texts]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _client(url: str):
+    def embed_batch(texts: list) -> list:
+        req = urllib.request.Request(
+            url, data=json.dumps({"texts": texts}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return json.loads(resp.read())["embeddings"]
+    return embed_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=40)
+    parser.add_argument("--per-text-ms", type=float, default=0.5)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--sequential-sample", type=int, default=200,
+                        help="chunks embedded one-by-one (extrapolated to --chunks)")
+    args = parser.parse_args()
+
+    server = _serve(args.latency_ms / 1000, args.per_text_ms / 1000, args.fail_rate)
+    embed_batch = _client(f"http://127.0.0.1:{server.server_port}/embed")
+    texts = [f"chunk {i} " + "lorem ipsum " * 50 for i in range(args.chunks)]
+
+    try:
+        print(f"chunks={args.chunks} batch={args.batch_size} latency={args.latency_ms:.0f} ms"
+              f" +{args.per_text_ms} ms/text fail_rate={args.fail_rate:.0%}")
+        print("mode                    chunks/s   batch p50   batch max  retries")
+
+        one = EmbeddingExecutor(embed_batch, batch_size=1, concurrency=1, backoff=0.05)
+        sample = texts[:args.sequential_sample]
+        _, seconds = timed(lambda: [one.run([t]) for t in sample])
+        print(f"{'per-chunk sequential':<22} {len(sample) / seconds:9.1f}")
+
+        for concurrency in (1, 2, 4, 8):
+            ex = EmbeddingExecutor(embed_batch, batch_size=args.batch_size,
+                                   concurrency=concurrency, backoff=0.05)
+            vectors = ex.run(texts)
+            run = ex.last_run
+            assert vectors == [_fake_vector(t) for t in texts], "vectors out of order"
+            print(f"{'batched x' + str(concurrency):<22} {run['chunks_per_s']:9.1f}"
+                  f"  {run['batch_p50_s'] * 1000:8.0f}ms  {run['batch_max_s'] * 1000:8.0f}ms"
+                  f"  {run['retries']:7d}")
+            ex.shutdown()
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Retrieval quality, memory and search time per embedding dimension.
+
+The knowledge base is chunked with the structured chunker and embedded once,
+at the model's full size, with gemini-embedding-001. Vectors go through the
+chunk-embedding cache, so reruns are free. Each --dims size is then the
+Matryoshka truncation of those vectors, renormalised as EMBEDDING_DIM does.
+For every size the benchmark reports:
+
+  hit@k      fraction of the research-paper eval set's relevant statements
+             covered by the top-k chunks (as in benchmarks.chunking)
+  overlap@k  agreement of the top-k with the full-size top-k
+  MB / 100k  flat-index memory for 100k chunks
+  ms/query   flat search over the chunks tiled up to --tile vectors
+
+Needs GOOGLE_API_KEY.
+
+    python -m benchmarks.embedding_dims --dims 0 1536 768 512 256 128 --k 4
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from benchmarks.common import EVAL_SET, is_hit, knowledge_base_pdfs
+from tools import ingest
+from tools.embedding_dims import truncate
+
+
+def _no_redaction(texts: list) -> list:
+    return texts
+
+
+def main():
+    import faiss
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    from tools.RAG import EMBEDDING_MODEL
+    from tools.embedding_cache import CachedEmbeddings
+    from tools.embedding_executor import BatchedEmbeddings
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dims", type=int, nargs="+", default=[0, 1536, 768, 512, 256, 128],
+                        help="0 = full size")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--tile", type=int, default=100000)
+    args = parser.parse_args()
+
+    base = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
+    embeddings = CachedEmbeddings(BatchedEmbeddings(base))
+    per_file = {}
+    for path in knowledge_base_pdfs():
+        chunks = ingest.load_and_chunk(path, _no_redaction, workers=1, chunker="structured")
+        texts = [d.page_content for d in chunks]
+        per_file[os.path.basename(path)] = (texts, np.asarray(embeddings.embed_documents(texts), dtype=np.float32))
+    queries = {q: np.asarray(base.embed_query(q), dtype=np.float32) for _f, q, _r in EVAL_SET}
+    full = next(iter(per_file.values()))[1].shape[1]
+
+    def top_k(name, query, dim):
+        texts, vectors = per_file[name]
+        docs = np.asarray(truncate(vectors, dim))
+        q = np.asarray(truncate(queries[query], dim))
+        return list(np.argsort(-(docs @ q))[:args.k])
+
+    all_vectors = np.concatenate([v for _t, v in per_file.values()])
+    tiled = np.resize(all_vectors, (args.tile, full))
+    probes = np.stack(list(queries.values()))
+
+    print(f"model={EMBEDDING_MODEL} full dim={full} chunks={len(all_vectors)} k={args.k}")
+    print("dim     hit@k   overlap@k   MB / 100k   ms/query")
+    faiss.omp_set_num_threads(1)
+    for dim in args.dims:
+        dim = dim or full
+        hits = total = overlap = 0
+        for name, query, relevant in EVAL_SET:
+            texts = per_file[name][0]
+            top = top_k(name, query, dim)
+            hits += sum(any(is_hit(s, texts[i]) for i in top) for s in relevant)
+            total += len(relevant)
+            overlap += len(set(top) & set(top_k(name, query, full))) / max(1, len(top))
+
+        index = faiss.IndexFlatIP(dim)
+        index.add(np.asarray(truncate(tiled, dim), dtype=np.float32))
+        q = np.asarray(truncate(probes, dim), dtype=np.float32)
+        t0 = time.perf_counter()
+        for row in q:
+            index.search(row[None, :], args.k)
+        ms = (time.perf_counter() - t0) / len(q) * 1000
+
+        print(f"{dim:<6} {hits / total:6.1%}   {overlap / len(EVAL_SET):9.2f}   "
+              f"{100000 * dim * 4 / 1e6:9.1f}   {ms:8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Pickle docstore (FAISS.save_local) vs the memory-mapped index format.
+
+Builds a synthetic index of --chunks chunks (knowledge-base text, random
+--dim vectors), saves it in both formats, then opens each one in a fresh
+process and reports load time, RSS growth and the time of a first k=6
+search, which materialises the returned Documents.
+
+    python -m benchmarks.index_format --chunks 50000 --dim 768
+"""
+import argparse
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import knowledge_base_pdfs
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _corpus(n: int) -> list:
+    import fitz
+
+    lines = []
+    for path in knowledge_base_pdfs():
+        with fitz.open(path) as doc:
+            lines.extend(l for page in doc for l in page.get_text().splitlines() if l.strip())
+    return [" ".join(lines[(i * 7 + j) % len(lines)] for j in range(12)) + f" #{i}" for i in range(n)]
+
+
+def _probe(fmt: str, path: str, dim: int, out):
+    from langchain_community.vectorstores import FAISS
+    from tools.index_store import load_index
+
+    before = _rss_mb()
+    t0 = time.perf_counter()
+    if fmt == "pickle":
+        db = FAISS.load_local(path, None, allow_dangerous_deserialization=True)
+    else:
+        db = load_index(path, None)
+    load_s = time.perf_counter() - t0
+    rss = _rss_mb() - before
+
+    query = np.random.default_rng(1).random(dim, dtype=np.float32).tolist()
+    t0 = time.perf_counter()
+    docs = db.similarity_search_by_vector(query, k=6)
+    search_s = time.perf_counter() - t0
+    out.put((load_s, rss, search_s, [d.page_content[-8:] for d in docs]))
+
+
+def main():
+    from langchain_community.vectorstores import FAISS
+    from tools.index_store import save_index
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    texts = _corpus(args.chunks)
+    vectors = np.random.default_rng(0).random((args.chunks, args.dim), dtype=np.float32)
+    db = FAISS.from_embeddings(
+        list(zip(texts, vectors.tolist())), None,
+        metadatas=[{"page": i // 20, "source": "bench.pdf"} for i in range(args.chunks)],
+    )
+
+    tmp = tempfile.mkdtemp(prefix="bench_index_")
+    try:
+        paths = {"pickle": os.path.join(tmp, "pickle"), "mmap": os.path.join(tmp, "mmap")}
+        db.save_local(paths["pickle"])
+        save_index(db, paths["mmap"])
+        del db
+
+        ctx = mp.get_context("spawn")
+        print(f"chunks={args.chunks} dim={args.dim}")
+        print("format   load ms   RSS +MB   first search ms")
+        results = {}
+        for fmt, path in paths.items():
+            out = ctx.Queue()
+            proc = ctx.Process(target=_probe, args=(fmt, path, args.dim, out))
+            proc.start()
+            load_s, rss, search_s, hits = out.get()
+            proc.join()
+            results[fmt] = hits
+            print(f"{fmt:<7} {load_s * 1000:8.1f}  {rss:8.1f}  {search_s * 1000:12.2f}")
+        print(f"same results: {results['pickle'] == results['mmap']}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
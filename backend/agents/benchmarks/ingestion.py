@@ -0,0 +1,57 @@
+"""
+Serial vs page-sharded ingestion.
+
+    python -m benchmarks.ingestion --pages 300 --workers 4
+    python -m benchmarks.ingestion --pdf /path/to/contract.pdf
+"""
+import argparse
+import os
+
+# Time real redaction: no hits from the on-disk memo, and nothing written to
+# the app's redaction_cache.db. Set before tools is imported so the ingestion
+# pool workers see it too.
+os.environ["REDACTION_CACHE_MAX_MB"] = "0"
+
+from benchmarks.common import synthetic_pdf, timed
+from tools import ingest
+from tools.pii import redact_pii_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pdf", help="PDF to ingest (default: synthetic from Knowledge-Base)")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=0, help="0 = auto")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    path = args.pdf or synthetic_pdf(args.pages)
+    try:
+        pages = ingest.page_count(path)
+        workers = ingest._resolve_workers(args.workers)
+        ingest.INGEST_SHARD_MIN_PAGES = 0
+
+        # Warm the parent engine and the pool so model load isn't measured.
+        redact_pii_batch(["warm up"])
+        ingest.load_and_chunk(path, redact_pii_batch, workers=workers)
+
+        serial, t_serial = timed(ingest.load_and_chunk, path, redact_pii_batch,
+                                 workers=1, repeat=args.repeat)
+        sharded, t_sharded = timed(ingest.load_and_chunk, path, redact_pii_batch,
+                                   workers=workers, repeat=args.repeat)
+
+        same = [(d.page_content, d.metadata["page"]) for d in serial] == \
+               [(d.page_content, d.metadata["page"]) for d in sharded]
+        print(f"pages={pages} chunks={len(serial)} workers={workers}")
+        print(f"serial   {t_serial:8.2f}s  {pages / t_serial:7.1f} pages/s")
+        print(f"sharded  {t_sharded:8.2f}s  {pages / t_sharded:7.1f} pages/s"
+              f"  speedup x{t_serial / t_sharded:.2f}")
+        print(f"identical output: {same}")
+    finally:
+        ingest.shutdown_pool()
+        if not args.pdf:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
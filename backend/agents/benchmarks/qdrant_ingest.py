@@ -0,0 +1,105 @@
+"""
+Qdrant ingestion throughput: LangChain's serial add_texts vs parallel upserts.
+
+Writes --chunks synthetic chunks (random --dim vectors, precomputed, so only
+the write path is timed) into a scratch collection:
+
+  langchain  Qdrant.add_texts, serial batches of 64 with wait=True (the old
+             from_texts path)
+  parallel   tools.QdrantRAG.upsert_points: QDRANT_UPSERT_BATCH-sized batches,
+             QDRANT_UPSERT_PARALLEL in flight, wait=False, count barrier
+
+each over HTTP and gRPC against QDRANT_HOST (QDRANT_PORT / QDRANT_GRPC_PORT),
+e.g. the docker-compose service or `docker run -p 6333:6333 -p 6334:6334
+qdrant/qdrant`. --local uses the in-process client (no transport) instead.
+
+    python -m benchmarks.qdrant_ingest --chunks 20000
+    QDRANT_UPSERT_BATCH=512 QDRANT_UPSERT_PARALLEL=8 python -m benchmarks.qdrant_ingest
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from tools import QdrantRAG
+
+SCRATCH = "papermind_bench_ingest"
+
+
+class _Precomputed(Embeddings):
+    def __init__(self, texts, vectors):
+        self.table = dict(zip(texts, vectors))
+
+    def embed_documents(self, texts):
+        return [self.table[t] for t in texts]
+
+    def embed_query(self, text):
+        return self.table[text]
+
+
+def _clients(local: bool):
+    from qdrant_client import QdrantClient
+
+    if local:
+        return {"local": QdrantClient(":memory:")}
+    host = os.getenv("QDRANT_HOST", "localhost")
+    port = int(os.getenv("QDRANT_PORT", "6333"))
+    grpc_port = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+    api_key = os.getenv("QDRANT_API_KEY") or None
+    return {
+        "http": QdrantClient(host=host, port=port, api_key=api_key),
+        "grpc": QdrantClient(host=host, port=port, grpc_port=grpc_port,
+                             prefer_grpc=True, api_key=api_key),
+    }
+
+
+def main():
+    from langchain_community.vectorstores import Qdrant
+    from qdrant_client.models import Distance, PointStruct, VectorParams
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--local", action="store_true", help="in-process Qdrant instead of a server")
+    args = parser.parse_args()
+
+    doc_hash = "0" * 64
+    texts = [f"benchmark chunk {i} " + "lorem ipsum dolor sit amet " * 40 for i in range(args.chunks)]
+    vectors = np.random.default_rng(0).random((args.chunks, args.dim), dtype=np.float32).tolist()
+    metadatas = [{"source": "bench.pdf", "chunk_id": i, "doc_hash": doc_hash, "page": i // 20}
+                 for i in range(args.chunks)]
+    embeddings = _Precomputed(texts, vectors)
+
+    print(f"chunks={args.chunks} dim={args.dim} batch={QdrantRAG.QDRANT_UPSERT_BATCH} "
+          f"parallel={QdrantRAG.QDRANT_UPSERT_PARALLEL}")
+    print("transport  path        seconds   chunks/s")
+    for transport, client in _clients(args.local).items():
+        for path in ("langchain", "parallel"):
+            try:
+                client.delete_collection(SCRATCH)
+            except Exception:
+                pass
+            client.create_collection(SCRATCH, vectors_config=VectorParams(
+                size=args.dim, distance=Distance.COSINE))
+            t0 = time.perf_counter()
+            if path == "langchain":
+                Qdrant(client=client, collection_name=SCRATCH, embeddings=embeddings).add_texts(
+                    texts, metadatas, batch_size=64)
+            else:
+                points = [
+                    PointStruct(id=QdrantRAG.point_id(doc_hash, i), vector=v,
+                                payload={"page_content": t, "metadata": md})
+                    for i, (t, md, v) in enumerate(zip(texts, metadatas, vectors))
+                ]
+                QdrantRAG.upsert_points(client, SCRATCH, doc_hash, points)
+            secs = time.perf_counter() - t0
+            assert client.count(SCRATCH, exact=True).count == args.chunks
+            print(f"{transport:<9}  {path:<10} {secs:8.2f}  {args.chunks / secs:9.0f}")
+        client.delete_collection(SCRATCH)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Per-query overhead of _get_or_build_qdrant_index on an already-indexed document.
+
+"cold" clears the readiness registry before every call, which is the old
+path: the file is hashed in full, then get_collection and count go to Qdrant.
+"warm" is a repeat query, where one stat() and a registry lookup decide it.
+The document's collection is pre-created with placeholder points, so nothing
+is embedded.
+
+Qdrant is reached through QDRANT_HOST / QDRANT_PORT. With --local, an
+in-process client is used instead; it has no network round trips, so it
+understates the saving.
+
+    python -m benchmarks.qdrant_readiness --pages 300 --queries 200
+    python -m benchmarks.qdrant_readiness --local
+"""
+import argparse
+import os
+import statistics
+import time
+
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.common import synthetic_pdf
+from tools import QdrantRAG
+
+DIM = 768
+
+
+class _NoEmbeddings(Embeddings):
+    dim = DIM
+
+    def embed_documents(self, texts):
+        raise RuntimeError("benchmark must not embed")
+
+    def embed_query(self, text):
+        raise RuntimeError("benchmark must not embed")
+
+
+def _timed(fn, n: int) -> list:
+    out = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def main():
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import Distance, PointStruct, VectorParams
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300, help="synthetic PDF size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--local", action="store_true", help="in-process Qdrant instead of a server")
+    args = parser.parse_args()
+
+    if args.local:
+        QdrantRAG._qdrant_client = QdrantClient(":memory:")
+    elif QdrantRAG._init_qdrant() is None:
+        raise SystemExit("Qdrant unreachable; start it or pass --local")
+    client = QdrantRAG._qdrant_client
+
+    path = synthetic_pdf(args.pages)
+    doc_hash = QdrantRAG.index_key(path)
+    if QdrantRAG.QDRANT_LAYOUT == "shared":
+        coll = QdrantRAG.shared_collection(doc_hash)
+        QdrantRAG.ensure_shared_collection(client, coll, DIM)
+    else:
+        coll = QdrantRAG._collection_name(path, doc_hash)
+        client.create_collection(coll, vectors_config=VectorParams(
+            size=DIM, distance=Distance.COSINE))
+    payload = {"page_content": "", "metadata": {"doc_hash": doc_hash}, "complete": True}
+    client.upsert(coll, points=[
+        PointStruct(id=QdrantRAG.point_id(doc_hash, i), vector=[1.0] * DIM, payload=payload)
+        for i in range(8)
+    ])
+
+    embeddings = _NoEmbeddings()
+    lookup = lambda: QdrantRAG._get_or_build_qdrant_index(path, embeddings)
+
+    def cold():
+        QdrantRAG.forget()
+        lookup()
+
+    try:
+        print(f"layout={QdrantRAG.QDRANT_LAYOUT} pdf={os.path.getsize(path) / 1e6:.1f} MB "
+              f"({args.pages} pages) qdrant={'local' if args.local else 'server'}")
+        print("path    p50 ms    p95 ms")
+        for name, fn in (("cold", cold), ("warm", lookup)):
+            fn()
+            ms = sorted(_timed(fn, args.queries))
+            print(f"{name:<5} {statistics.median(ms):8.3f}  {ms[int(len(ms) * 0.95) - 1]:8.3f}")
+        print(f"registry: {QdrantRAG.READY_STATS}")
+    finally:
+        if QdrantRAG.QDRANT_LAYOUT == "shared":
+            from qdrant_client.models import FilterSelector
+            client.delete(coll, points_selector=FilterSelector(
+                filter=QdrantRAG.doc_filter(doc_hash, complete_only=False)))
+        else:
+            client.delete_collection(coll)
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+PII redaction throughput.
+
+Per-page vs batched nlp.pipe on the full path, then throughput, recall and
+precision of the "tiered" and "fast" tiers against the full path. A
+full-path entity is recalled when a tier result overlaps it. A tier result
+that overlaps none is over-redaction and counts against precision. The
+"figures" column counts redactions in a fixed set of non-PII numbers
+(amounts, clause and version numbers, year ranges) that no tier should
+touch.
+
+    python -m benchmarks.redaction --pages 200 --batch-size 32
+"""
+import argparse
+import os
+from collections import Counter
+
+# Time real redaction: no hits from the on-disk memo, and nothing written to
+# the app's redaction_cache.db. Set before tools is imported.
+os.environ["REDACTION_CACHE_MAX_MB"] = "0"
+
+from benchmarks.common import knowledge_base_pdfs, timed
+
+
+def _pages(limit: int) -> list:
+    import fitz
+
+    texts = []
+    while len(texts) < limit:
+        for path in knowledge_base_pdfs():
+            with fitz.open(path) as doc:
+                texts.extend(page.get_text() for page in doc)
+    return texts[:limit]
+
+
+def _recall(reference: list, candidate: list):
+    found, missed = 0, Counter()
+    for ref, cand in zip(reference, candidate):
+        for r in ref:
+            if any(c.start < r.end and r.start < c.end for c in cand):
+                found += 1
+            else:
+                missed[r.entity_type] += 1
+    total = found + sum(missed.values())
+    return (found / total if total else 1.0), total, missed
+
+
+def _precision(reference: list, candidate: list):
+    kept, extra = 0, Counter()
+    for ref, cand in zip(reference, candidate):
+        for c in cand:
+            if any(c.start < r.end and r.start < c.end for r in ref):
+                kept += 1
+            else:
+                extra[c.entity_type] += 1
+    total = kept + sum(extra.values())
+    return (kept / total if total else 1.0), extra
+
+
+# Business figures that must survive redaction.
+_FIGURES = [
+    "Revenue for 2023 was 1234567 units.",
+    "Operating income rose to 98765432 in FY2022.",
+    "See clause 12.3.10 and schedule 4.2.1.",
+    "Release 2.10.1 replaces 1.9.12.",
+    "Fiscal 2019-2020 compared with 2020-2021.",
+    "Net assets: 4500000; liabilities: 3200000.",
+    "Section 10-4-2 applies to 350 of 1200 units.",
+]
+
+
+def main():
+    from tools import pii
+    from tools.pii import redact_pii, redact_pii_batch
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    texts = _pages(args.pages)
+    chars = sum(len(t) for t in texts)
+    redact_pii("warm up")
+
+    single, t_single = timed(lambda: [redact_pii(t) for t in texts], repeat=args.repeat)
+    batch, t_batch = timed(redact_pii_batch, texts, args.batch_size, repeat=args.repeat)
+
+    print(f"pages={len(texts)} chars={chars}")
+    print(f"per-page  {t_single:8.2f}s  {len(texts) / t_single:7.1f} pages/s")
+    print(f"batched   {t_batch:8.2f}s  {len(texts) / t_batch:7.1f} pages/s"
+          f"  speedup x{t_single / t_batch:.2f}")
+    print(f"identical output: {single == batch}")
+
+    print("\ntier     seconds   pages/s   MB/s   recall  precision  figures  (missed / over-redacted)")
+    reference = pii.analyze_batch(texts, "full", args.batch_size)
+    for tier in ("full", "tiered", "fast"):
+        _, seconds = timed(redact_pii_batch, texts, args.batch_size, tier, repeat=args.repeat)
+        results = pii.analyze_batch(texts, tier, args.batch_size)
+        recall, total, missed = _recall(reference, results)
+        precision, extra = _precision(reference, results)
+        figures = sum(len(r) for r in pii.analyze_batch(_FIGURES, tier, args.batch_size))
+        print(f"{tier:<7} {seconds:8.2f}  {len(texts) / seconds:8.1f}  "
+              f"{chars / seconds / 1e6:5.2f}  {recall:6.1%}  {precision:8.1%}  {figures:7d}  "
+              f"{dict(missed.most_common(5))} / {dict(extra.most_common(5))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Event-loop latency during an upload.
+
+Simulates SSE streams as coroutines that emit a token every --interval ms and
+records the gap between tokens while a --mb upload is written into the blob
+store, first inline on the event loop (the old copyfileobj path) and then
+through asyncio.to_thread as /chat does now.
+
+    python -m benchmarks.upload_latency --mb 100 --streams 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from utility import blob_store
+
+
+async def _stream(interval: float, gaps: list, stop: asyncio.Event):
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        gaps.append(now - last)
+        last = now
+
+
+async def _run(mode: str, src_path: str, streams: int, interval: float):
+    gaps: list = []
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(_stream(interval, gaps, stop)) for _ in range(streams)]
+    await asyncio.sleep(interval * 5)
+    gaps.clear()
+
+    t0 = time.perf_counter()
+    with open(src_path, "rb") as src:
+        if mode == "inline":
+            blob_store.save_stream(src, "upload.pdf", max_bytes=0)
+        else:
+            await asyncio.to_thread(blob_store.save_stream, src, "upload.pdf", 0)
+    upload_s = time.perf_counter() - t0
+
+    await asyncio.sleep(interval * 2)
+    stop.set()
+    await asyncio.gather(*tasks)
+    gaps_ms = sorted(g * 1000 for g in gaps)
+    p99 = gaps_ms[int(len(gaps_ms) * 0.99) - 1] if gaps_ms else 0.0
+    print(f"{mode:<9} upload {upload_s:6.2f}s  token gap p50 {statistics.median(gaps_ms):7.1f} ms"
+          f"  p99 {p99:7.1f} ms  max {gaps_ms[-1]:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mb", type=int, default=100)
+    parser.add_argument("--streams", type=int, default=8)
+    parser.add_argument("--interval", type=float, default=20, help="ms between tokens")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        blob_store.BLOB_DIR = os.path.join(tmp, "blobs")
+        src_path = os.path.join(tmp, "src.bin")
+        with open(src_path, "wb") as f:
+            for _ in range(args.mb):
+                f.write(os.urandom(1024 * 1024))
+
+        print(f"upload={args.mb} MB streams={args.streams} token interval={args.interval:.0f} ms")
+        for mode in ("inline", "to_thread"):
+            for name in os.listdir(blob_store.BLOB_DIR) if os.path.isdir(blob_store.BLOB_DIR) else []:
+                os.remove(os.path.join(blob_store.BLOB_DIR, name))
+            asyncio.run(_run(mode, src_path, args.streams, args.interval / 1000))
+
+
+if __name__ == "__main__":
+    main()
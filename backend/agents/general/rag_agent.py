@@ -1,8 +1,9 @@
 from google.adk.agents import Agent
 from google.adk.tools import FunctionTool, ToolContext
 from google.adk.tools.agent_tool import AgentTool
-from tools.RAG import run_rag_pipeline
+from tools.RAG import run_session_rag
 from google.genai import types
+import asyncio
 import os
 
 
@@ -33,21 +34,28 @@ Be clear, concise, and helpful.
 def get_file_path(file_path: str, tool_context: ToolContext):
     """Store the uploaded file path in session state."""
     tool_context.state['file_path'] = file_path
+    file_paths = list(tool_context.state.get('file_paths') or [])
+    if file_path not in file_paths:
+        file_paths.append(file_path)
+    tool_context.state['file_paths'] = file_paths
     return f"File path stored: {file_path}"
 
 
 async def execute_rag_pipeline(tool_context: ToolContext):
-    """Execute RAG pipeline using the stored file path."""
-    file_path = tool_context.state.get('file_path')
+    """Execute RAG pipeline over every stored file path in one retrieval."""
+    file_paths = tool_context.state.get('file_paths') or [tool_context.state.get('file_path')]
+    file_paths = [p for p in file_paths if p]
     
-    if not file_path:
+    if not file_paths:
         return "No document uploaded. Please upload a document first."
     
-    if not os.path.exists(file_path):
-        return f"Document not found at path: {file_path}"
+    for file_path in file_paths:
+        if not os.path.exists(file_path):
+            return f"Document not found at path: {file_path}"
     
     try:
-        summary = run_rag_pipeline(file_path, GENERAL_RAG)
+        # Worker thread, so other users' streams keep flowing during builds.
+        summary = await asyncio.to_thread(run_session_rag, file_paths, GENERAL_RAG, domain="general")
         tool_context.state['summary'] = summary
         return summary
     except Exception as e:
@@ -64,9 +72,9 @@ general_rag_agent = Agent(
     You are a helpful assistant that analyzes any type of document.
     
     When a user uploads a document:
-    1. The file path is provided in the conversation - extract it
-    2. Use the file_path tool to store the path: file_path(path="<extracted_path>")
-    3. Then call execute_rag_pipeline to analyze the document
+    1. The file paths are provided in the conversation - extract them
+    2. Use the file_path tool to store each path: file_path(path="<extracted_path>")
+    3. Then call execute_rag_pipeline once; it analyzes all stored documents together
     
     If a summary already exists in session state, use it for answering questions.
     Don't re-run RAG if you already have the summary.
@@ -1,33 +1,42 @@
+import asyncio
 import logging
 import os
-import shutil
 import uuid
 from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Optional, List, AsyncGenerator
 
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from bson import ObjectId
 from dotenv import load_dotenv
+
+# Before any local import: tools/ and utility/ read their settings (PII_TIERS,
+# EMBEDDING_DIM, MAX_UPLOAD_MB, ...) when they are imported.
+load_dotenv()
+
 import motor.motor_asyncio
 from google.genai import types
 from google.adk.sessions import DatabaseSessionService
 from google.adk.runners import Runner
 from google.adk.agents import Agent
 from utility import utils
+from utility import blob_store
+from tools import pii as pii_engine
+from tools import embedding_cache, embedding_executor, index_gc, redaction_cache
+from tools import QdrantRAG as qdrant_rag
+from tools.RAG import hot_cache_stats, seed_query_cache
+from tools.prompts import LEGAL_RAG, EDUCATION_RAG, FINANCE_RAG
 import uvicorn
 
 from legal.agent import legal_agent, legal_agent_tool
 from education.agent import education_agent, education_agent_tool
 from finance.agent import finance_agent, finance_agent_tool
-from general.rag_agent import general_rag_agent, general_rag_agent_tool
+from general.rag_agent import general_rag_agent, general_rag_agent_tool, GENERAL_RAG
 from fastapi.responses import JSONResponse
 
-load_dotenv()
-
 # ── Structured logging ────────────────────────────────────────────────────────
 logging.basicConfig(
     level=logging.INFO,
@@ -93,6 +102,43 @@ async def lifespan(app: "FastAPI"):
         log.error("Failed to initialize ADK session service: %s", e)
         session_service = None
 
+    # Load Presidio + spaCy now so the first upload doesn't pay for it.
+    stats = await asyncio.to_thread(pii_engine.warm_up)
+    if stats.get("ready"):
+        log.info(
+            "PII engine warmed up in %.2fs (RSS %.0f MB, engine +%.0f MB)",
+            stats["load_seconds"], stats["rss_mb"], stats["rss_delta_mb"],
+        )
+    else:
+        log.error("PII engine warm-up failed: %s", stats.get("error"))
+
+    # The agents always retrieve with these prompts; embed them once up front.
+    try:
+        seeded = await asyncio.to_thread(
+            seed_query_cache, [LEGAL_RAG, EDUCATION_RAG, FINANCE_RAG, GENERAL_RAG]
+        )
+        log.info("Query embedding cache seeded with %d domain prompts", seeded)
+    except Exception as e:
+        log.error("Failed to seed query embedding cache: %s", e)
+
+    # Connect to Qdrant, or load the embedded store from disk, before the
+    # first question arrives.
+    try:
+        stats = await asyncio.to_thread(qdrant_rag.warm_up)
+        if stats["tier"]:
+            log.info(
+                "Qdrant ready (%s): %d collections%s in %.2fs",
+                stats["tier"], stats["collections"],
+                f", ~{stats['points']} points" if "points" in stats else "", stats["seconds"],
+            )
+        else:
+            log.warning("Qdrant unavailable — RAG will use FAISS")
+    except Exception as e:
+        log.error("Qdrant warm-up failed: %s", e)
+
+    # Keep tools/faiss_cache under its disk budget and clear crashed builds.
+    index_gc.start_background()
+
     if not os.getenv("RAILWAY_VOLUME_MOUNT_PATH"):
         log.warning(
             "No Railway volume detected — SQLite session DB and uploaded files "
@@ -110,10 +156,32 @@ async def lifespan(app: "FastAPI"):
 
     yield
 
+    # Flush the embedded Qdrant store and release its lock for the next start.
+    await asyncio.to_thread(qdrant_rag.close)
+
 
 # ── App ───────────────────────────────────────────────────────────────────────
 app = FastAPI(title="PaperMind API", version="1.0.0", lifespan=lifespan)
 
+
+# Registered before CORS so the 413 still carries CORS headers.
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """
+    413 on the declared Content-Length, before FastAPI reads and spools the
+    multipart body. Requests without one (chunked) are still capped per file
+    by blob_store.save_stream.
+    """
+    limit = blob_store.MAX_REQUEST_BYTES
+    declared = request.headers.get("content-length")
+    if limit and declared and declared.isdigit() and int(declared) > limit:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Request exceeds the {limit // (1024 * 1024)} MB upload limit."},
+        )
+    return await call_next(request)
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -249,25 +317,41 @@ async def _update_adk_id(user_id: ObjectId, chat_id: str, adk_id: str):
     )
 
 
-async def _get_session_file_paths(user_id: ObjectId, chat_id: str) -> List[str]:
+async def _get_session_files(user_id: ObjectId, chat_id: str) -> tuple:
+    """The session's existing blob paths and {path: original filename}."""
     doc = await chats_collection.find_one(
         {"userId": user_id, "sessions.sessionId": chat_id},
         {"sessions.$": 1},
     )
     if doc and doc.get("sessions"):
-        raw = doc["sessions"][0].get("filePaths", [])
-        return [p for p in raw if os.path.exists(p)]
-    return []
+        session = doc["sessions"][0]
+        paths = [p for p in session.get("filePaths", []) if os.path.exists(p)]
+        return paths, _file_names(paths, session.get("files", []))
+    return [], {}
+
+
+def _file_names(paths: List[str], refs: List[dict]) -> dict:
+    """{blob path: original filename} from the session's file refs."""
+    by_hash = {r.get("sha256"): r.get("filename") for r in refs}
+    names = {}
+    for p in paths:
+        name = by_hash.get(os.path.basename(p).split(".", 1)[0])
+        if name:
+            names[p] = name
+    return names
 
 
 async def _append_session_file_paths(
-    user_id: ObjectId, chat_id: str, new_paths: List[str]
+    user_id: ObjectId, chat_id: str, new_paths: List[str], refs: List[dict] = None
 ):
+    """Reference shared blobs from the session; *refs* keep the original filenames."""
     if not new_paths:
         return
+    update = {"$addToSet": {"sessions.$.filePaths": {"$each": new_paths}}}
+    if refs:
+        update["$push"] = {"sessions.$.files": {"$each": refs}}
     await chats_collection.update_one(
-        {"userId": user_id, "sessions.sessionId": chat_id},
-        {"$push": {"sessions.$.filePaths": {"$each": new_paths}}},
+        {"userId": user_id, "sessions.sessionId": chat_id}, update,
     )
 
 
@@ -299,7 +383,9 @@ def read_file_content(path: str) -> str:
         return ""
 
 
-def _build_prompt(agent_type: str, query: str, file_paths: List[str]) -> str:
+def _build_prompt(
+    agent_type: str, query: str, file_paths: List[str], file_names: dict = None
+) -> str:
     agent_type_lower = agent_type.lower()
 
     if agent_type_lower == "general":
@@ -308,9 +394,13 @@ def _build_prompt(agent_type: str, query: str, file_paths: List[str]) -> str:
         prompt = f'Please perform a full {agent_type_lower} analysis.\nUser Query: "{query}"'
 
     if file_paths:
+        # Blobs are named by content hash; the original filename lets the
+        # agent tell documents apart and name them. Numbered in the order
+        # the RAG context labels them ("Document N").
         prompt += "\n\nDocuments:\n"
-        for p in file_paths:
-            prompt += f"\nFile path: {p}\n"
+        for n, p in enumerate(file_paths, 1):
+            prompt += f"\nDocument {n}: {(file_names or {}).get(p, os.path.basename(p))}\n"
+            prompt += f"File path: {p}\n"
             if not p.lower().endswith(".pdf"):
                 content = read_file_content(p)
                 if content:
@@ -320,10 +410,11 @@ def _build_prompt(agent_type: str, query: str, file_paths: List[str]) -> str:
 
 
 async def _process(
-    agent_type: str, username: str, adk_id: str, query: str, file_paths: List[str]
+    agent_type: str, username: str, adk_id: str, query: str, file_paths: List[str],
+    file_names: dict = None,
 ) -> str:
     runner  = _get_runner(agent_type)
-    prompt  = _build_prompt(agent_type, query, file_paths)
+    prompt  = _build_prompt(agent_type, query, file_paths, file_names)
     content = types.Content(role="user", parts=[types.Part(text=prompt)])
     result_text = ""
     async for chunk in runner.run_async(
@@ -337,11 +428,12 @@ async def _process(
 
 
 async def _stream_process(
-    agent_type: str, username: str, adk_id: str, query: str, file_paths: List[str]
+    agent_type: str, username: str, adk_id: str, query: str, file_paths: List[str],
+    file_names: dict = None,
 ) -> AsyncGenerator[str, None]:
     """Yield SSE lines `data: <token>\n\n`."""
     runner  = _get_runner(agent_type)
-    prompt  = _build_prompt(agent_type, query, file_paths)
+    prompt  = _build_prompt(agent_type, query, file_paths, file_names)
     content = types.Content(role="user", parts=[types.Part(text=prompt)])
     try:
         async for chunk in runner.run_async(
@@ -390,6 +482,8 @@ async def health_check():
         "mongodb":         mongo_status,
         "db_name":         db.name,
         "session_service": "ready" if session_service else "unavailable (using in-memory fallback)",
+        "pii_engine":      pii_engine.ENGINE_STATS or "not loaded",
+        "embedding":       embedding_executor.stats(),
     }
 
     if not mongo_ok:
@@ -398,6 +492,16 @@ async def health_check():
     return payload
 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "redaction":  redaction_cache.stats(),
+        "embeddings": embedding_cache.stats(),
+        "hot_index":  hot_cache_stats(),
+        "index_disk": index_gc.stats(),
+    }
+
+
 @app.post("/chat")
 async def chat(
     agent:     str                        = Form(...),
@@ -416,25 +520,48 @@ async def chat(
         username, agent, stream, sessionId,
     )
 
-    # ── Save uploaded files ────────────────────────────────────────────────────
+    # ── Save uploaded files (content-addressed, shared across users) ─────────
     new_file_paths: List[str] = []
+    new_file_refs: List[dict] = []
     if files:
         for f in files:
             if f and f.filename:
                 safe_filename = os.path.basename(f.filename)
-                safe = f"{username}_{datetime.now().timestamp()}_{safe_filename}"
-                dest = os.path.join(UPLOAD_DIR, safe)
+                limit = blob_store.MAX_UPLOAD_BYTES
+                # The body is already spooled by now (the middleware caught
+                # oversized requests); this just skips copying a big file.
+                if limit and f.size is not None and f.size > limit:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"'{safe_filename}' exceeds the {limit // (1024 * 1024)} MB upload limit.",
+                    )
                 try:
-                    with open(dest, "wb") as buf:
-                        shutil.copyfileobj(f.file, buf)
+                    # Copy + hash in a worker thread so other sessions' SSE
+                    # streams keep flowing while a large file is written.
+                    blob = await asyncio.to_thread(blob_store.save_stream, f.file, safe_filename)
+                except blob_store.UploadTooLarge:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"'{safe_filename}' exceeds the {limit // (1024 * 1024)} MB upload limit.",
+                    )
                 except OSError as e:
                     log.error("Failed to save upload %s: %s", f.filename, e)
                     raise HTTPException(
                         status_code=500,
                         detail=f"Could not save uploaded file '{f.filename}'. Check server storage.",
                     )
-                new_file_paths.append(dest)
-                log.info("Saved upload: %s", dest)
+                if blob.path not in new_file_paths:
+                    new_file_paths.append(blob.path)
+                new_file_refs.append({
+                    "sha256":     blob.sha256,
+                    "filename":   safe_filename,
+                    "size":       blob.size,
+                    "uploadedAt": datetime.now(),
+                })
+                log.info(
+                    "Saved upload %s as %s (%s)",
+                    safe_filename, blob.path, "deduplicated" if blob.deduplicated else "new",
+                )
 
     # ── User + chat doc ────────────────────────────────────────────────────────
     user_id = await _get_user_id(username)
@@ -452,10 +579,13 @@ async def chat(
         adk_id         = await _create_adk_session(username)
         await _add_session_to_mongo(user_id, active_chat_id, adk_id, agent)
 
-    stored_paths = await _get_session_file_paths(user_id, active_chat_id)
+    stored_paths, file_names = await _get_session_files(user_id, active_chat_id)
     if new_file_paths:
-        await _append_session_file_paths(user_id, active_chat_id, new_file_paths)
-    file_paths = stored_paths + new_file_paths
+        await _append_session_file_paths(
+            user_id, active_chat_id, new_file_paths, new_file_refs
+        )
+    file_paths = stored_paths + [p for p in new_file_paths if p not in stored_paths]
+    file_names = {**_file_names(new_file_paths, new_file_refs), **file_names}
 
     log.info(
         "Resolved | session=%s adk=%s files=%d",
@@ -467,7 +597,7 @@ async def chat(
         collected: List[str] = []
 
         async def sse_with_save():
-            async for chunk in _stream_process(agent, username, adk_id, question, file_paths):
+            async for chunk in _stream_process(agent, username, adk_id, question, file_paths, file_names):
                 if chunk != "data: [DONE]\n\n":
                     payload = chunk.replace("data: ", "").strip()
                     collected.append(payload)
@@ -487,7 +617,7 @@ async def chat(
         )
 
     # ── Standard JSON response ─────────────────────────────────────────────────
-    answer = await _process(agent, username, adk_id, question, file_paths)
+    answer = await _process(agent, username, adk_id, question, file_paths, file_names)
     await _save_message(user_id, active_chat_id, question, answer)
     log.info("Response: %s", answer[:200])
 
@@ -1,7 +1,15 @@
+import asyncio
+import contextlib
 import os
 import hashlib
 import re
+import threading
+import time
+import uuid
 from dotenv import load_dotenv
+from tools.embedding_dims import discover_dim, suffix as dim_suffix
+from tools.pii import redact_pii_batch, tier_for, tier_suffix
+from utility.blob_store import hash_from_path
 
 load_dotenv()
 google_api_key = os.getenv("GOOGLE_API_KEY")
@@ -9,75 +17,45 @@ if google_api_key:
     os.environ["GOOGLE_API_KEY"] = google_api_key
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
 # Collection prefix shared across all document collections
 _COLLECTION_PREFIX = "papermind_docs"
 
+# ── Collection layout ─────────────────────────────────────────────────────────
+# per_document  one collection per uploaded file (prefix_basename_hash).
+# shared        every chunk goes to one of QDRANT_SHARDS collections
+#               (papermind_chunks[_N], picked by document hash) with indexed
+#               doc_hash / page / domain payload fields; retrieval filters on
+#               doc_hash. `python -m tools.qdrant_migrate` moves existing
+#               per-document collections across.
+QDRANT_LAYOUT = os.getenv("QDRANT_LAYOUT", "per_document").lower()
+QDRANT_SHARDS = max(1, int(os.getenv("QDRANT_SHARDS", "1")))
+SHARED_COLLECTION = "papermind_chunks"
+
+_ensured: set = set()  # shared collections created/indexed by this process
+_ensure_lock = threading.Lock()
+_embedded_write_lock = threading.Lock()  # the in-process client allows one writer
+
+# ── Backend tiers ─────────────────────────────────────────────────────────────
+# server  the Qdrant server at QDRANT_HOST; FAISS if it is unreachable (default)
+# local   Qdrant embedded in this process, persisted under QDRANT_LOCAL_PATH
+# auto    server, then the embedded store, then FAISS (opt-in: a server that
+#         is down at boot leaves the process on the embedded store)
+# The embedded store keeps Qdrant's retrieval (score threshold, payload
+# filters) on single-node and test deployments without a server. It holds a
+# file lock on its directory, so only one process (one uvicorn worker) can
+# open it; any other falls back to FAISS. The tier is picked on first connect
+# and kept until restart.
+QDRANT_MODE = os.getenv("QDRANT_MODE", "server").lower()
+# `or`, not a getenv default: env.example ships QDRANT_LOCAL_PATH= empty.
+QDRANT_LOCAL_PATH = os.getenv("QDRANT_LOCAL_PATH") or os.path.join(_HERE, "qdrant_local")
+
 # ── Lazy globals ──────────────────────────────────────────────────────────────
 _qdrant_client = None
-_pii_analyzer = None
-_pii_anonymizer = None
-_PII_ENTITIES: list = []
-
-
-# ── PII engine ────────────────────────────────────────────────────────────────
-
-def _init_pii():
-    """Lazy-initialise Presidio once."""
-    global _pii_analyzer, _pii_anonymizer, _PII_ENTITIES
-    if _pii_analyzer is not None:
-        return
-    try:
-        from presidio_analyzer import AnalyzerEngine, Pattern as _P, PatternRecognizer
-        from presidio_anonymizer import AnonymizerEngine
-        from presidio_analyzer.nlp_engine import NlpEngineProvider
-
-        _provider = NlpEngineProvider(nlp_configuration={
-            "nlp_engine_name": "spacy",
-            "models": [{"lang_code": "en", "model_name": "en_core_web_sm"}],
-        })
-        _pii_analyzer = AnalyzerEngine(nlp_engine=_provider.create_engine())
-        _pii_anonymizer = AnonymizerEngine()
-
-        for _entity, _name, _regex, _score in [
-            ("CASE_NUMBER",     "case_number",
-             r"\b(case|c\.?no\.?|docket)\s*[:\-]?\s*[A-Z0-9\-\/]+\b", 0.6),
-            ("CONTRACT_NUMBER", "contract_number",
-             r"\b(contract|policy)\s*(no|number)?\s*[:\-]?\s*[A-Z0-9\-\/]{5,}\b", 0.6),
-            ("STUDENT_ID",      "student_id",
-             r"\b(student|roll|registration)\s*(id|no|number)?\s*[:\-]?\s*[A-Z0-9\-]{4,}\b", 0.6),
-            ("SALARY",          "salary",
-             r"\b(salary|compensation|ctc|pay|wage)\s*[:\-]?\s*(\$|₹|€)?\s?\d[\d,]*(\.\d+)?\b", 0.55),
-            ("TRANSACTION_ID",  "transaction_id",
-             r"\b(transaction|txn|reference)\s*(id|no|number)?\s*[:\-]?\s*[A-Z0-9\-]{6,}\b", 0.6),
-        ]:
-            _pii_analyzer.registry.add_recognizer(
-                PatternRecognizer(
-                    supported_entity=_entity,
-                    patterns=[_P(_name, _regex, _score)],
-                )
-            )
-
-        _PII_ENTITIES = [
-            "PERSON", "NRP", "PHONE_NUMBER", "EMAIL_ADDRESS", "LOCATION",
-            "CREDIT_CARD", "IBAN_CODE", "BANK_ACCOUNT", "CRYPTO", "US_SSN",
-            "MEDICAL_LICENSE", "DATE_TIME", "URL",
-            "CASE_NUMBER", "CONTRACT_NUMBER", "STUDENT_ID", "SALARY", "TRANSACTION_ID",
-        ]
-        print("PII engine initialized (QdrantRAG.py)")
-    except Exception as e:
-        print(f"PII engine init failed (QdrantRAG.py): {e}")
-
-
-def redact_pii(text) -> str:
-    _init_pii()
-    text = str(text)
-    if _pii_analyzer is None or _pii_anonymizer is None:
-        return text
-    try:
-        results = _pii_analyzer.analyze(text=text, entities=_PII_ENTITIES, language="en")
-        return _pii_anonymizer.anonymize(text=text, analyzer_results=results).text
-    except Exception:
-        return text
+QDRANT_TIER = None  # "server" | "local" once connected
+_async_qdrant_client = None
+_connect_kwargs: dict = {}
 
 
 # ── Qdrant client ─────────────────────────────────────────────────────────────
@@ -98,20 +76,42 @@ def _init_qdrant():
     Fix: log the exception type and message so operators can distinguish
     "connection refused" from "401 Unauthorized" immediately.
     """
-    global _qdrant_client
+    global _qdrant_client, QDRANT_TIER
     if _qdrant_client is not None:
         return _qdrant_client
 
+    if QDRANT_MODE in ("server", "auto"):
+        _qdrant_client = _connect_server()
+        if _qdrant_client is not None:
+            QDRANT_TIER = "server"
+    if _qdrant_client is None and QDRANT_MODE in ("local", "auto"):
+        _qdrant_client = _open_local()
+        if _qdrant_client is not None:
+            QDRANT_TIER = "local"
+    if _qdrant_client is None:
+        print("Qdrant unavailable. Will fall back to FAISS for all requests.")
+    return _qdrant_client
+
+
+def _connect_server():
+    """Health-checked client for the Qdrant server, or None."""
+    global _connect_kwargs
+
     host = os.getenv("QDRANT_HOST", "localhost")
     port = int(os.getenv("QDRANT_PORT", "6333"))
     api_key = os.getenv("QDRANT_API_KEY") or None  # None if empty string
+    # gRPC (docker-compose exposes 6334) carries large upserts with far less
+    # encoding overhead than JSON over HTTP.
+    prefer_grpc = os.getenv("QDRANT_PREFER_GRPC", "true").lower() in ("1", "true", "yes")
+    grpc_port = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
 
     try:
         from qdrant_client import QdrantClient
         from qdrant_client.models import Distance, VectorParams
 
         # api_key is genuinely optional — Qdrant runs without auth by default.
-        connect_kwargs = {"host": host, "port": port}
+        connect_kwargs = {"host": host, "port": port,
+                          "grpc_port": grpc_port, "prefer_grpc": prefer_grpc}
         if api_key:
             connect_kwargs["api_key"] = api_key
 
@@ -122,24 +122,114 @@ def _init_qdrant():
         # exists but every subsequent call would fail.
         client.get_collections()
 
-        _qdrant_client = client
-        print(f"Connected to Qdrant at {host}:{port} (auth={'yes' if api_key else 'no'})")
+        _connect_kwargs = connect_kwargs
+        print(f"Connected to Qdrant at {host}:{grpc_port if prefer_grpc else port} "
+              f"({'gRPC' if prefer_grpc else 'HTTP'}, auth={'yes' if api_key else 'no'})")
+        return client
     except Exception as e:
         # Log the real error class so operators can distinguish auth vs
         # connectivity vs version-mismatch issues.
-        print(
-            f"Qdrant connection failed [{type(e).__name__}]: {e}. "
-            "Will fall back to FAISS for all requests."
-        )
-        _qdrant_client = None
+        print(f"Qdrant connection failed [{type(e).__name__}]: {e}.")
+        return None
 
-    return _qdrant_client
+
+def _open_local():
+    """Embedded Qdrant persisted under QDRANT_LOCAL_PATH, or None."""
+    try:
+        from qdrant_client import QdrantClient
+
+        # Opening the store loads every collection into memory, so this is
+        # where a restart pays to warm up.
+        client = QdrantClient(path=QDRANT_LOCAL_PATH)
+        print(f"Using embedded Qdrant at {QDRANT_LOCAL_PATH} "
+              f"({len(client.get_collections().collections)} collections)")
+        return client
+    except Exception as e:
+        # Typically another worker already holds the store's lock.
+        print(f"Embedded Qdrant unavailable [{type(e).__name__}]: {e}.")
+        return None
+
+
+def warm_up() -> dict:
+    """Connect (or load the embedded store) now, so the first question doesn't wait."""
+    t0 = time.perf_counter()
+    client = _init_qdrant()
+    if client is None:
+        return {"tier": None}
+    names = [c.name for c in client.get_collections().collections]
+    stats = {"tier": QDRANT_TIER, "collections": len(names)}
+    if QDRANT_TIER == "local":
+        # In-process counts are free; on a server this would be one round trip
+        # per collection (per document in the per_document layout).
+        stats["points"] = sum(client.count(n, exact=False).count for n in names)
+    return {**stats, "seconds": time.perf_counter() - t0}
+
+
+def close():
+    """Release the client; the embedded store flushes and drops its lock."""
+    global _qdrant_client, _async_qdrant_client, _connect_kwargs, QDRANT_TIER
+    if _qdrant_client is not None:
+        _qdrant_client.close()
+    _qdrant_client = _async_qdrant_client = QDRANT_TIER = None
+    _connect_kwargs = {}
+    _ensured.clear()
+    forget()
+
+
+async def _init_async_qdrant():
+    """
+    Lazy-initialise the AsyncQdrantClient used for query-time searches.
+
+    The sync client is connected (and health-checked) first, in a worker
+    thread; builds keep using it. Returns None when Qdrant is unavailable
+    or embedded: the embedded store can only be opened once, so callers
+    search it with the sync client instead.
+    """
+    global _async_qdrant_client
+    if _async_qdrant_client is not None:
+        return _async_qdrant_client
+    if _qdrant_client is None and await asyncio.to_thread(_init_qdrant) is None:
+        return None
+    if QDRANT_TIER != "server" or not _connect_kwargs:  # embedded, or injected directly
+        return None
+    from qdrant_client import AsyncQdrantClient
+
+    _async_qdrant_client = AsyncQdrantClient(**_connect_kwargs)
+    return _async_qdrant_client
+
+
+# ── Readiness registry ────────────────────────────────────────────────────────
+# Once a document's index is known to be complete, repeat queries skip the
+# full-file hash and the get_collection / count round trips: the registry maps
+# (path, size, mtime) to the collection and filter to search. A changed file
+# gets a new key; entries for a document are dropped when it is (re)built and
+# when a search against it fails.
+_ready: dict = {}  # (path, size, mtime_ns, tier) -> (collection, doc_hash, search_filter)
+_ready_lock = threading.Lock()
+READY_STATS = {"hits": 0, "misses": 0}
+
+
+def _file_key(path: str) -> tuple:
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+def forget(path: str = None, doc_hash: str = None):
+    """Drop registry entries for *path* and/or *doc_hash* (both None: all)."""
+    path = os.path.abspath(path) if path else None
+    with _ready_lock:
+        for key, (_coll, h, _f) in list(_ready.items()):
+            if (path is None and doc_hash is None) or key[0] == path or h == doc_hash:
+                del _ready[key]
 
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
 def _doc_hash(path: str) -> str:
     """Full SHA-256 of file bytes."""
+    known = hash_from_path(path)  # content-addressed uploads carry their hash
+    if known:
+        return known
     h = hashlib.sha256()
     with open(path, "rb") as f:
         for block in iter(lambda: f.read(65536), b""):
@@ -147,22 +237,97 @@ def _doc_hash(path: str) -> str:
     return h.hexdigest()
 
 
-def _collection_name(path: str) -> str:
-    """Human-readable, Qdrant-safe collection name: prefix_basename_hash."""
+def index_key(path: str, domain: str = "general") -> str:
+    """
+    Identity of *path*'s index for *domain*: its hash plus the redaction tier
+    ("<sha256>-tiered"). Used wherever a bare doc hash would be (collection
+    names, point ids, the doc_hash payload field), so each tier is indexed
+    separately.
+    """
+    return _doc_hash(path) + tier_suffix(domain)
+
+
+def _collection_name(path: str, doc_hash: str = None) -> str:
+    """Human-readable, Qdrant-safe collection name: prefix_basename_hash-tier[-dN]."""
     base = re.sub(r"[^a-zA-Z0-9_\-]", "_", os.path.basename(path))[:40]
-    return f"{_COLLECTION_PREFIX}_{base}_{_doc_hash(path)}"
+    return f"{_COLLECTION_PREFIX}_{base}_{doc_hash or index_key(path)}{dim_suffix()}"
+
+
+def shared_collection(doc_hash: str) -> str:
+    """Shared collection holding *doc_hash*'s chunks."""
+    if QDRANT_SHARDS == 1:
+        return SHARED_COLLECTION + dim_suffix()
+    return f"{SHARED_COLLECTION}_{int(doc_hash[:8], 16) % QDRANT_SHARDS}{dim_suffix()}"
+
+
+def point_id(doc_hash: str, chunk_id: int) -> str:
+    """Stable point id, so rebuilding or migrating a document overwrites it."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{doc_hash}:{chunk_id}"))
+
+
+def doc_filter(doc_hash: str, complete_only: bool = True):
+    """Payload filter selecting one document's chunks in a shared collection."""
+    from qdrant_client.models import FieldCondition, Filter, MatchValue
+
+    must = [FieldCondition(key="metadata.doc_hash", match=MatchValue(value=doc_hash))]
+    if complete_only:
+        must.append(FieldCondition(key="complete", match=MatchValue(value=True)))
+    return Filter(must=must)
+
 
+def _collection_exists(client, coll: str) -> bool:
+    try:
+        client.get_collection(coll)
+        return True
+    except Exception:
+        return False
+
+
+def ensure_shared_collection(client, coll: str, size: int):
+    """Create *coll* and its payload indexes if missing (once per process)."""
+    from qdrant_client.models import Distance, PayloadSchemaType, VectorParams
 
-def _load_and_chunk(path: str):
-    from langchain_community.document_loaders import PyMuPDFLoader
-    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    if coll in _ensured:
+        return
+    with _ensure_lock:
+        if coll in _ensured:
+            return
+        if not _collection_exists(client, coll):
+            try:
+                client.create_collection(
+                    collection_name=coll,
+                    vectors_config=VectorParams(size=size, distance=Distance.COSINE),
+                )
+            except Exception:
+                if not _collection_exists(client, coll):  # not a create race
+                    raise
+        for field, schema in (
+            ("metadata.doc_hash", PayloadSchemaType.KEYWORD),
+            ("metadata.page", PayloadSchemaType.INTEGER),
+            ("metadata.domain", PayloadSchemaType.KEYWORD),
+            ("complete", PayloadSchemaType.BOOL),
+        ):
+            client.create_payload_index(coll, field_name=field, field_schema=schema)
+        _ensured.add(coll)
+
+
+def mark_complete(client, coll: str, doc_hash: str):
+    """Flag *doc_hash*'s chunks searchable once all of them are written."""
+    with _embedded_write_lock if _is_embedded(client) else contextlib.nullcontext():
+        client.set_payload(
+            collection_name=coll,
+            payload={"complete": True},
+            points=doc_filter(doc_hash, complete_only=False),
+        )
 
-    docs = PyMuPDFLoader(file_path=path).load()
-    for d in docs:
-        d.page_content = redact_pii(str(d.page_content))
-    return RecursiveCharacterTextSplitter(
-        chunk_size=2000, chunk_overlap=200
-    ).split_documents(docs)
+
+def _load_and_chunk(path: str, workers=None, domain: str = "general"):
+    """Redacted chunks of *path*; large PDFs are sharded across processes."""
+    from functools import partial
+    from tools.ingest import load_and_chunk
+
+    redact = partial(redact_pii_batch, tier=tier_for(domain))
+    return load_and_chunk(path, redact, workers=workers)
 
 
 def _deduplicate_docs(docs, threshold: float = 0.95) -> list:
@@ -185,26 +350,137 @@ def _deduplicate_docs(docs, threshold: float = 0.95) -> list:
     return result
 
 
-def _get_or_build_qdrant_index(path: str, embeddings):
-    """Return a Qdrant vectorstore for *path*, building it if not cached."""
-    from qdrant_client.models import Distance, VectorParams
+def _get_or_build_qdrant_index(path: str, embeddings, domain: str = "general"):
+    """
+    Return ``(vectorstore, search_filter)`` for *path*, building the index if
+    needed. *search_filter* is None in the per-document layout.
+    """
     from langchain_community.vectorstores import Qdrant
 
-    coll = _collection_name(path)
-
+    key = _file_key(path) + (tier_for(domain),)
+    with _ready_lock:
+        entry = _ready.get(key)
+        if entry is not None:
+            READY_STATS["hits"] += 1
+    if entry is None:
+        entry = _resolve_index(path, embeddings, domain)
+        with _ready_lock:
+            READY_STATS["misses"] += 1
+            _ready[key] = entry
+    coll, _doc, search_filter = entry
+    return Qdrant(client=_qdrant_client, collection_name=coll, embeddings=embeddings), search_filter
+
+
+def _resolve_index(path: str, embeddings, domain: str):
+    """Check (and if needed build) *path*'s index: ``(collection, doc_hash, filter)``."""
+    from tools.single_flight import build_lock
+
+    doc_hash = index_key(path, domain)
+    if QDRANT_LAYOUT == "shared":
+        coll = shared_collection(doc_hash)
+        ensure_shared_collection(_qdrant_client, coll, discover_dim(embeddings))
+        if not _doc_ready(coll, doc_hash):
+            with build_lock(f"qdrant-{doc_hash}"):
+                if not _doc_ready(coll, doc_hash):  # not built while we waited
+                    forget(doc_hash=doc_hash)
+                    _build_shared_document(path, coll, doc_hash, embeddings, domain)
+        return coll, doc_hash, doc_filter(doc_hash)
+
+    coll = _collection_name(path, doc_hash)
+    if _doc_ready(coll, doc_hash):
+        return coll, doc_hash, None
+
+    # Concurrent requests for the same document (in this process or another
+    # worker) wait here for one build instead of racing delete/create.
+    with build_lock(coll):
+        if not _doc_ready(coll, doc_hash):  # not built while we waited
+            forget(doc_hash=doc_hash)
+            _build_qdrant_collection(path, coll, doc_hash, embeddings, domain)
+    return coll, doc_hash, None
+
+
+def _doc_ready(coll: str, doc_hash: str) -> bool:
     try:
-        _qdrant_client.get_collection(coll)
-        count = _qdrant_client.count(coll)
-        if count and count.value > 0:
-            return Qdrant(
-                client=_qdrant_client,
-                collection_name=coll,
-                embeddings=embeddings,
-            )
+        return _qdrant_client.count(coll, count_filter=doc_filter(doc_hash), exact=True).count > 0
     except Exception:
-        pass
+        return False
+
+
+# ── Ingestion ─────────────────────────────────────────────────────────────────
+# Points go out in QDRANT_UPSERT_BATCH-sized batches, QDRANT_UPSERT_PARALLEL
+# at a time, with wait=False so Qdrant applies them while later batches are
+# still in flight. A count barrier then waits until every point is visible
+# before the document is flagged complete.
+QDRANT_UPSERT_BATCH = int(os.getenv("QDRANT_UPSERT_BATCH", "256"))
+QDRANT_UPSERT_PARALLEL = int(os.getenv("QDRANT_UPSERT_PARALLEL", "4"))
+QDRANT_BARRIER_TIMEOUT_S = float(os.getenv("QDRANT_BARRIER_TIMEOUT_S", "120"))
+
+
+def _is_embedded(client) -> bool:
+    return type(getattr(client, "_client", client)).__name__ == "QdrantLocal"
+
+
+def await_points(client, coll: str, doc_hash: str, expected: int, timeout: float = None):
+    """Block until *expected* points of *doc_hash* are visible in *coll*."""
+    timeout = QDRANT_BARRIER_TIMEOUT_S if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    delay = 0.02
+    while True:
+        n = client.count(coll, count_filter=doc_filter(doc_hash, complete_only=False), exact=True).count
+        if n >= expected:
+            return
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{coll}: {n}/{expected} points visible after {timeout:.0f}s")
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+def upsert_points(client, coll: str, doc_hash: str, points: list, batch_size: int = None,
+                  parallel: int = None):
+    """Fire-and-forget parallel upserts of *points*, then wait for all of them."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    batch_size = batch_size or QDRANT_UPSERT_BATCH
+    parallel = parallel or QDRANT_UPSERT_PARALLEL
+    batches = [points[i:i + batch_size] for i in range(0, len(points), batch_size)]
+    if _is_embedded(client):
+        # The in-process client is not safe for concurrent writes, including
+        # two documents being built at once.
+        with _embedded_write_lock:
+            for b in batches:
+                client.upsert(coll, points=b)
+        return
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+        list(pool.map(lambda b: client.upsert(coll, points=b, wait=False), batches))
+    await_points(client, coll, doc_hash, len(points))
+
+
+def _index_chunks(coll: str, doc_hash: str, texts: list, metadatas: list, embeddings):
+    """Embed *texts* and write them to *coll* as *doc_hash*'s points, then flag it complete."""
+    from qdrant_client.models import PointStruct
+    from tools.embedding_cache import CachedEmbeddings
+    from tools.embedding_executor import BatchedEmbeddings
+
+    reuse = CachedEmbeddings(BatchedEmbeddings(embeddings))
+    vectors = reuse.embed_documents(texts)
+    points = [
+        # Same payload layout as LangChain's Qdrant wrapper, which reads them back.
+        PointStruct(id=point_id(doc_hash, i), vector=list(v),
+                    payload={"page_content": t, "metadata": md})
+        for i, (t, md, v) in enumerate(zip(texts, metadatas, vectors))
+    ]
+    upsert_points(_qdrant_client, coll, doc_hash, points)
+    # Searches require the top-level complete flag, so a half-written
+    # document stays invisible.
+    mark_complete(_qdrant_client, coll, doc_hash)
+    reuse.report(doc_hash)
+
+
+def _build_qdrant_collection(path: str, coll: str, doc_hash: str, embeddings, domain: str):
+    """(Re)create *coll* and index *path* into it. Caller holds the build lock."""
+    from qdrant_client.models import Distance, VectorParams
 
-    # Create collection and index document
+    # Drop any half-written collection from a crashed build
     try:
         _qdrant_client.delete_collection(coll)
     except Exception:
@@ -212,95 +488,93 @@ def _get_or_build_qdrant_index(path: str, embeddings):
 
     _qdrant_client.create_collection(
         collection_name=coll,
-        vectors_config=VectorParams(size=768, distance=Distance.COSINE),
+        vectors_config=VectorParams(size=discover_dim(embeddings), distance=Distance.COSINE),
     )
 
-    chunks = _load_and_chunk(path)
+    chunks = _load_and_chunk(path, domain=domain)
     texts = [d.page_content for d in chunks]
-    metadatas = [{"source": path, "chunk_id": i} for i in range(len(chunks))]
+    metadatas = [{"source": path, "chunk_id": i, "doc_hash": doc_hash} for i in range(len(chunks))]
+    _index_chunks(coll, doc_hash, texts, metadatas, embeddings)
 
-    Qdrant.from_texts(
-        client=_qdrant_client,
-        collection_name=coll,
-        texts=texts,
-        embedding=embeddings,
-        metadatas=metadatas,
-    )
 
-    return Qdrant(
-        client=_qdrant_client,
-        collection_name=coll,
-        embeddings=embeddings,
-    )
+def _build_shared_document(path: str, coll: str, doc_hash: str, embeddings, domain: str):
+    """Index *path* into shared *coll*. Caller holds the build lock."""
+    from qdrant_client.models import FilterSelector
 
-import json
-import re
+    # Drop chunks left by a crashed build of this document
+    _qdrant_client.delete(coll, points_selector=FilterSelector(filter=doc_filter(doc_hash, complete_only=False)))
 
-def redact_pii_safe(text: str) -> str:
-    """
-    Redact PII from text while preserving valid JSON arrays.
-    """
+    chunks = _load_and_chunk(path, domain=domain)
+    texts = [d.page_content for d in chunks]
+    metadatas = [
+        {**d.metadata, "source": path, "chunk_id": i, "doc_hash": doc_hash, "domain": domain}
+        for i, d in enumerate(chunks)
+    ]
+    _index_chunks(coll, doc_hash, texts, metadatas, embeddings)
 
-    def find_json_arrays(s):
-        positions = []
-        stack = []
-        in_string = False
-        escape = False
-
-        for i, ch in enumerate(s):
-            if ch == '"' and not escape:
-                in_string = not in_string
-            elif ch == '\\' and in_string:
-                escape = not escape
-                continue
-            else:
-                escape = False
+# ── Public entry point ────────────────────────────────────────────────────────
+RETRIEVE_K = 10
+SCORE_THRESHOLD = 0.45
 
-            if in_string:
-                continue
 
-            if ch == '[':
-                stack.append(i)
-            elif ch == ']' and stack:
-                start = stack.pop()
-                if not stack:  # top-level candidate
-                    candidate = s[start:i+1]
-                    try:
-                        parsed = json.loads(candidate)
-                        if isinstance(parsed, list):
-                            positions.append((start, i+1))
-                    except:
-                        pass
+def _make_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
 
-        return positions
+    return ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.3)
 
-    arrays = find_json_arrays(text)
 
-    if not arrays:
-        return redact_pii(text)
+def _answer_chain():
+    from langchain_core.prompts import PromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+    from tools.RAG import ANSWER_TEMPLATE
 
-    result = []
-    last = 0
+    # FIX: question and system instructions are now separate — no double
+    # injection of the question into the prompt.
+    prompt = PromptTemplate(template=ANSWER_TEMPLATE, input_variables=["context", "question"])
+    return prompt | _make_llm() | StrOutputParser()
 
-    for start, end in arrays:
-        # redact before
-        result.append(redact_pii(text[last:start]))
-        # keep JSON intact
-        result.append(text[start:end])
-        last = end
 
-    # redact remaining
-    result.append(redact_pii(text[last:]))
+def _context(raw_docs: list) -> str:
+    # Retrieve more candidates than needed, then de-duplicate in Python
+    # to approximate MMR behaviour.
+    docs = _deduplicate_docs(raw_docs)[:6]  # keep at most 6 diverse chunks
+    return "\n\n---\n\n".join(d.page_content for d in docs)
 
-    return ''.join(result)
 
-# ── Public entry point ────────────────────────────────────────────────────────
+def _to_documents(hits) -> list:
+    from langchain_core.documents import Document
+
+    return [
+        Document(page_content=(h.payload or {}).get("page_content", ""),
+                 metadata=(h.payload or {}).get("metadata") or {})
+        for h in hits
+    ]
+
+
+def _search(client, coll: str, vector: list, search_filter, k: int, threshold: float) -> list:
+    """Top-*k* chunks scoring at least *threshold*, as Documents."""
+    kwargs = dict(collection_name=coll, query_filter=search_filter, limit=k,
+                  score_threshold=threshold, with_payload=True)
+    if hasattr(client, "search"):  # qdrant-client < 1.13
+        return _to_documents(client.search(query_vector=vector, **kwargs))
+    return _to_documents(client.query_points(query=vector, **kwargs).points)
 
-def run_qdrant_rag(user_path: str, question: str) -> str:
+
+async def _asearch(client, coll: str, vector: list, search_filter, k: int, threshold: float) -> list:
+    """``_search`` on the async client."""
+    kwargs = dict(collection_name=coll, query_filter=search_filter, limit=k,
+                  score_threshold=threshold, with_payload=True)
+    if hasattr(client, "search"):  # qdrant-client < 1.13
+        return _to_documents(await client.search(query_vector=vector, **kwargs))
+    return _to_documents((await client.query_points(query=vector, **kwargs)).points)
+
+
+def run_qdrant_rag(user_path: str, question: str, domain: str = "general") -> str:
     """
     Answer *question* using the document at *user_path*.
 
-    Tries Qdrant first; falls back to FAISS if Qdrant is unavailable.
+    Tries Qdrant first (the server or the embedded store, per QDRANT_MODE);
+    falls back to FAISS if neither is available.
 
     Parameters
     ----------
@@ -308,62 +582,75 @@ def run_qdrant_rag(user_path: str, question: str) -> str:
         Absolute path to the PDF (or text) file.
     question : str
         The user's question.
+    domain : str
+        Agent type ("legal", "finance", ...); selects the PII redaction tier.
     """
+    from tools.RAG import finish_answer, run_rag_pipeline
+
     _init_qdrant()
 
     if not _qdrant_client:
         print("Qdrant unavailable — falling back to FAISS")
-        from tools.RAG import run_rag_pipeline
         # FIX: pass question (not init_prompt) to match updated RAG.py signature
-        return run_rag_pipeline(user_path, question)
+        return run_rag_pipeline(user_path, question, domain)
 
     try:
-        from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-        from langchain_core.prompts import PromptTemplate
-        from langchain_core.output_parsers import StrOutputParser
-
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
-        db = _get_or_build_qdrant_index(user_path, embeddings)
-
-        # Retrieve more candidates than needed, then de-duplicate in Python
-        # to approximate MMR behaviour (Qdrant's LangChain wrapper doesn't
-        # expose native MMR).
-        retriever = db.as_retriever(
-            search_type="similarity_score_threshold",
-            search_kwargs={"k": 10, "score_threshold": 0.45},
-        )
+        from tools.RAG import make_embeddings
 
-        raw_docs = retriever.invoke(question or "Summarise the document.")
-        docs = _deduplicate_docs(raw_docs)[:6]  # keep at most 6 diverse chunks
-        context = "\n\n---\n\n".join(d.page_content for d in docs)
-
-        llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.3)
-
-        # FIX: question and system instructions are now separate — no double
-        # injection of the question into the prompt.
-        prompt = PromptTemplate(
-            template=(
-                "You are a precise document assistant.\n"
-                "Use ONLY the context below to answer. "
-                "If the answer is not present say: "
-                '"I do not have that information in the provided documents."\n\n'
-                "Context:\n{context}\n\n"
-                "Question:\n{question}\n"
-            ),
-            input_variables=["context", "question"],
-        )
+        question = question or "Summarise the document."
+        embeddings = make_embeddings()
+        db, search_filter = _get_or_build_qdrant_index(user_path, embeddings, domain)
 
-        chain = prompt | llm | StrOutputParser()
-        answer = chain.invoke({"context": context, "question": question or "Summarise the document."})
-            
-        raw_output = chain.invoke(question or "Summarise the document.")
+        raw_docs = _search(_qdrant_client, db.collection_name, embeddings.embed_query(question),
+                           search_filter, RETRIEVE_K, SCORE_THRESHOLD)
+        context = _context(raw_docs)
+        raw_output = _answer_chain().invoke({"context": context, "question": question})
+        return finish_answer(raw_output)
 
-        if "[" in raw_output and "question" in raw_output and "answer" in raw_output:
-            return raw_output
+    except Exception as e:
+        print(f"Qdrant RAG failed [{type(e).__name__}]: {e} — falling back to FAISS")
+        forget(path=user_path)  # re-check the collection next time
+        return run_rag_pipeline(user_path, question, domain)
+
+
+async def arun_qdrant_rag(user_path: str, question: str, domain: str = "general") -> str:
+    """
+    ``run_qdrant_rag`` for the event loop.
+
+    Searches go through AsyncQdrantClient and the LLM through ``ainvoke``, so
+    a request waiting on Qdrant or Gemini no longer stalls other requests'
+    streams. The remaining blocking work (first-time index builds, query
+    embedding, PII redaction, the FAISS fallback) runs in worker threads.
+    """
+    from tools.RAG import finish_answer, run_rag_pipeline
+
+    client = await _init_async_qdrant()
+    if client is None and _qdrant_client is None:
+        print("Qdrant unavailable — falling back to FAISS")
+        return await asyncio.to_thread(run_rag_pipeline, user_path, question, domain)
+
+    try:
+        from tools.RAG import make_embeddings
+
+        question = question or "Summarise the document."
+        embeddings = make_embeddings()
+        # A readiness-registry hit returns at once; a miss checks (and maybe
+        # builds) the index with the sync client off the loop.
+        db, search_filter = await asyncio.to_thread(
+            _get_or_build_qdrant_index, user_path, embeddings, domain
+        )
+        vector = await embeddings.aembed_query(question)
+        if client is not None:
+            raw_docs = await _asearch(client, db.collection_name, vector, search_filter,
+                                      RETRIEVE_K, SCORE_THRESHOLD)
+        else:  # embedded store
+            raw_docs = await asyncio.to_thread(_search, _qdrant_client, db.collection_name, vector,
+                                               search_filter, RETRIEVE_K, SCORE_THRESHOLD)
 
-        return redact_pii_safe(raw_output)
+        raw_output = await _answer_chain().ainvoke({"context": _context(raw_docs), "question": question})
+        return await asyncio.to_thread(finish_answer, raw_output)
 
     except Exception as e:
         print(f"Qdrant RAG failed [{type(e).__name__}]: {e} — falling back to FAISS")
-        from tools.RAG import run_rag_pipeline
-        return run_rag_pipeline(user_path, question)
+        forget(path=user_path)  # re-check the collection next time
+        return await asyncio.to_thread(run_rag_pipeline, user_path, question, domain)
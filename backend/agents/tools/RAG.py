@@ -1,7 +1,15 @@
 import os
 import hashlib
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from dotenv import load_dotenv
-import json
+from tools import index_gc
+from tools.embedding_dims import suffix as dim_suffix
+from tools.pii import redact_pii_batch, redact_pii_safe, tier_for, tier_suffix
+from utility.blob_store import hash_from_path
 
 load_dotenv()
 google_api_key = os.getenv("GOOGLE_API_KEY")
@@ -15,132 +23,100 @@ _HERE = os.path.dirname(os.path.abspath(__file__))
 FAISS_CACHE_DIR = os.path.join(_HERE, "faiss_cache")
 os.makedirs(FAISS_CACHE_DIR, exist_ok=True)
 
-# ── Lazy PII engine ───────────────────────────────────────────────────────────
-_analyzer = None
-_anonymizer = None
-_PII_ENTITIES: list = []
-
-
-def _init_pii():
-    """Initialize Presidio once; subsequent calls are no-ops."""
-    global _analyzer, _anonymizer, _PII_ENTITIES
-    if _analyzer is not None:
-        return
-    try:
-        from presidio_analyzer import AnalyzerEngine, Pattern as _P, PatternRecognizer
-        from presidio_anonymizer import AnonymizerEngine
-        from presidio_analyzer.nlp_engine import NlpEngineProvider
-
-        _provider = NlpEngineProvider(nlp_configuration={
-            "nlp_engine_name": "spacy",
-            "models": [{"lang_code": "en", "model_name": "en_core_web_sm"}],
-        })
-        _analyzer = AnalyzerEngine(nlp_engine=_provider.create_engine())
-        _anonymizer = AnonymizerEngine()
-
-        for _entity, _name, _regex, _score in [
-            ("CASE_NUMBER",     "case_number",
-             r"\b(case|c\.?no\.?|docket)\s*[:\-]?\s*[A-Z0-9\-\/]+\b", 0.6),
-            ("CONTRACT_NUMBER", "contract_number",
-             r"\b(contract|policy)\s*(no|number)?\s*[:\-]?\s*[A-Z0-9\-\/]{5,}\b", 0.6),
-            ("STUDENT_ID",      "student_id",
-             r"\b(student|roll|registration)\s*(id|no|number)?\s*[:\-]?\s*[A-Z0-9\-]{4,}\b", 0.6),
-            ("SALARY",          "salary",
-             r"\b(salary|compensation|ctc|pay|wage)\s*[:\-]?\s*(\$|₹|€)?\s?\d[\d,]*(\.\d+)?\b", 0.55),
-            ("TRANSACTION_ID",  "transaction_id",
-             r"\b(transaction|txn|reference)\s*(id|no|number)?\s*[:\-]?\s*[A-Z0-9\-]{6,}\b", 0.6),
-        ]:
-            _analyzer.registry.add_recognizer(
-                PatternRecognizer(
-                    supported_entity=_entity,
-                    patterns=[_P(_name, _regex, _score)],
-                )
-            )
-
-        _PII_ENTITIES = [
-            "PERSON", "NRP", "PHONE_NUMBER", "EMAIL_ADDRESS", "LOCATION",
-            "CREDIT_CARD", "IBAN_CODE", "BANK_ACCOUNT", "CRYPTO", "US_SSN",
-            "MEDICAL_LICENSE", "DATE_TIME", "URL",
-            "CASE_NUMBER", "CONTRACT_NUMBER", "STUDENT_ID", "SALARY", "TRANSACTION_ID",
-        ]
-        print("PII engine initialized (RAG.py)")
-    except Exception as e:
-        print(f"PII engine init failed (RAG.py): {e}")
-
-
-def redact_pii(text) -> str:
-    """Redact PII from text, initialising the engine on first use."""
-    _init_pii()
-    text = str(text)
-    if _analyzer is None or _anonymizer is None:
-        return text
-    try:
-        results = _analyzer.analyze(text=text, entities=_PII_ENTITIES, language="en")
-        return _anonymizer.anonymize(text=text, analyzer_results=results).text
-    except Exception:
-        return text
-    
-def redact_pii_safe(text: str) -> str:
-    """
-    Redact PII from text while preserving valid JSON arrays.
-    """
-
-    def find_json_arrays(s):
-        positions = []
-        stack = []
-        in_string = False
-        escape = False
-
-        for i, ch in enumerate(s):
-            if ch == '"' and not escape:
-                in_string = not in_string
-            elif ch == '\\' and in_string:
-                escape = not escape
-                continue
-            else:
-                escape = False
-
-            if in_string:
-                continue
+# ── Hot index cache ───────────────────────────────────────────────────────────
+# Complete vectorstores stay loaded, keyed by document hash, so follow-up
+# questions on a document skip opening the index directory again.
+# Least-recently-used entries are dropped once the estimated footprint
+# (vectors + chunk text) exceeds HOT_INDEX_CACHE_MB (0 disables).
+HOT_INDEX_CACHE_BYTES = int(float(os.getenv("HOT_INDEX_CACHE_MB", "512")) * 1024 * 1024)
+
+_hot: OrderedDict = OrderedDict()  # doc hash -> (db, bytes)
+_hot_lock = threading.Lock()
+HOT_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _index_bytes(db) -> int:
+    index = db.index
+    size = index.ntotal * index.d * 4
+    if hasattr(db.docstore, "nbytes"):  # memory-mapped docstore
+        return size + db.docstore.nbytes
+    for doc in getattr(db.docstore, "_dict", {}).values():
+        size += len(doc.page_content) + 64
+    return size
+
+
+def _hot_get(doc_hash: str):
+    with _hot_lock:
+        entry = _hot.get(doc_hash)
+        if entry is None:
+            HOT_STATS["misses"] += 1
+            return None
+        _hot.move_to_end(doc_hash)
+        HOT_STATS["hits"] += 1
+        return entry[0]
+
+
+def _hot_put(doc_hash: str, db):
+    if HOT_INDEX_CACHE_BYTES <= 0:
+        return db
+    size = _index_bytes(db)
+    if size > HOT_INDEX_CACHE_BYTES:
+        return db
+    with _hot_lock:
+        _hot[doc_hash] = (db, size)
+        _hot.move_to_end(doc_hash)
+        total = sum(b for _db, b in _hot.values())
+        while total > HOT_INDEX_CACHE_BYTES:
+            _victim, (_db, b) = _hot.popitem(last=False)
+            total -= b
+            HOT_STATS["evictions"] += 1
+    return db
 
-            if ch == '[':
-                stack.append(i)
-            elif ch == ']' and stack:
-                start = stack.pop()
-                if not stack:  # top-level candidate
-                    candidate = s[start:i+1]
-                    try:
-                        parsed = json.loads(candidate)
-                        if isinstance(parsed, list):
-                            positions.append((start, i+1))
-                    except:
-                        pass
 
-        return positions
+def hot_cache_stats() -> dict:
+    with _hot_lock:
+        lookups = HOT_STATS["hits"] + HOT_STATS["misses"]
+        return {
+            **HOT_STATS,
+            "hit_rate": round(HOT_STATS["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(_hot),
+            "bytes": sum(b for _db, b in _hot.values()),
+            "budget_bytes": HOT_INDEX_CACHE_BYTES,
+        }
 
-    arrays = find_json_arrays(text)
 
-    if not arrays:
-        return redact_pii(text)
+# ── Streaming builds ──────────────────────────────────────────────────────────
+# Pages flow parse → redact → chunk → embed → add to index in a background
+# thread. The partial index is checkpointed to "<hash>.partial" every
+# INDEX_CHECKPOINT_S seconds. When a build takes longer than
+# RAG_LATENCY_BUDGET_S (0 = always wait), run_rag_pipeline answers from the
+# latest checkpoint while the build carries on.
+RAG_LATENCY_BUDGET_S = float(os.getenv("RAG_LATENCY_BUDGET_S", "30"))
+INDEX_CHECKPOINT_S = float(os.getenv("INDEX_CHECKPOINT_S", "5"))
 
-    result = []
-    last = 0
+_builds: dict = {}  # doc hash -> _Build
+_builds_lock = threading.Lock()
 
-    for start, end in arrays:
-        # redact before
-        result.append(redact_pii(text[last:start]))
-        # keep JSON intact
-        result.append(text[start:end])
-        last = end
 
-    # redact remaining
-    result.append(redact_pii(text[last:]))
+class _Build:
+    """Progress of one in-flight streaming index build."""
 
-    return ''.join(result)
+    def __init__(self, doc_hash: str):
+        self.doc_hash = doc_hash
+        self.done = threading.Event()
+        self.checkpointed = threading.Event()
+        self.db = None
+        self.error = None
+        self.pages_done = 0
+        self.pages_total = 0
+        self.checkpoint_pages = 0
 
 
 def _doc_hash(path: str) -> str:
     """Full SHA-256 of file bytes — used as cache key."""
+    known = hash_from_path(path)  # content-addressed uploads carry their hash
+    if known:
+        return known
     h = hashlib.sha256()
     with open(path, "rb") as f:
         for block in iter(lambda: f.read(65536), b""):
@@ -148,35 +124,196 @@ def _doc_hash(path: str) -> str:
     return h.hexdigest()
 
 
-def _load_and_chunk(path: str):
-    from langchain_community.document_loaders import PyMuPDFLoader
-    from langchain_text_splitters import RecursiveCharacterTextSplitter
+def _load_and_chunk(path: str, workers=None, domain: str = "general"):
+    """Redacted chunks of *path*; large PDFs are sharded across processes."""
+    from functools import partial
+    from tools.ingest import load_and_chunk
 
-    docs = PyMuPDFLoader(file_path=path).load()
-    for d in docs:
-        d.page_content = redact_pii(str(d.page_content))
-    return RecursiveCharacterTextSplitter(
-        chunk_size=2000,
-        chunk_overlap=200,
-    ).split_documents(docs)
+    redact = partial(redact_pii_batch, tier=tier_for(domain))
+    return load_and_chunk(path, redact, workers=workers)
 
 
-def _get_or_build_index(path: str, embeddings):
-    """Return a cached FAISS index, building and persisting it on first use."""
+def _save_atomic(db, dest: str):
+    """Write *db* next to *dest* and swap it in, so readers never see half a save."""
+    from tools.index_store import save_index
+
+    tmp = f"{dest}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    save_index(db, tmp)
+    old = None
+    if os.path.isdir(dest):
+        old = f"{dest}.old-{uuid.uuid4().hex[:8]}"
+        os.rename(dest, old)
+    os.rename(tmp, dest)
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def _is_complete(index_path: str) -> bool:
+    return os.path.isdir(index_path) and os.path.exists(os.path.join(index_path, "index.faiss"))
+
+
+def _stream_build(path: str, index_path: str, embeddings, domain: str, build: _Build):
+    """Background worker: build the index page range by page range."""
+    from functools import partial
     from langchain_community.vectorstores import FAISS
+    from tools.ann import rebuild
+    from tools.embedding_cache import CachedEmbeddings
+    from tools.embedding_executor import BatchedEmbeddings
+    from tools.index_store import load_index
+    from tools.ingest import iter_chunks, page_count
+    from tools.single_flight import build_lock
+
+    partial_path = index_path + ".partial"
+    # Chunks embedded before (earlier document versions, evicted indexes, the
+    # Qdrant path) come from the embedding cache; the rest go out in
+    # full-size batches, a bounded number at a time.
+    embeddings = CachedEmbeddings(BatchedEmbeddings(embeddings))
+    try:
+        # _builds dedupes threads in this process; the file lock dedupes
+        # against other workers building the same document.
+        with build_lock(build.doc_hash):
+            try:
+                if _is_complete(index_path):  # finished by another worker while we waited
+                    build.db = _hot_put(build.doc_hash, load_index(index_path, embeddings))
+                    return
+                build.pages_total = page_count(path)
+                redact = partial(redact_pii_batch, tier=tier_for(domain))
+                db = None
+                last_checkpoint = 0.0
+                for _start, end, chunks in iter_chunks(path, redact):
+                    if chunks:
+                        if db is None:
+                            db = FAISS.from_documents(chunks, embeddings)
+                        else:
+                            db.add_documents(chunks)
+                    build.pages_done = end
+                    if db is not None and end < build.pages_total and \
+                            time.monotonic() - last_checkpoint >= INDEX_CHECKPOINT_S:
+                        _save_atomic(db, partial_path)
+                        last_checkpoint = time.monotonic()
+                        build.checkpoint_pages = end
+                        build.checkpointed.set()
+                if db is None:
+                    raise ValueError(f"No extractable text in {os.path.basename(path)}")
+                # Checkpoints stay flat; large documents get an ANN index at the end.
+                kind = rebuild(db)
+                if kind != "flat":
+                    print(f"Index {build.doc_hash[:16]}: rebuilt as {kind} ({db.index.ntotal} chunks)")
+                _save_atomic(db, index_path)
+                index_gc.record_entry(index_path)
+                embeddings.report(build.doc_hash)
+                build.db = _hot_put(build.doc_hash, db)
+            finally:
+                shutil.rmtree(partial_path, ignore_errors=True)
+    except Exception as e:
+        print(f"Index build failed [{type(e).__name__}]: {e}")
+        build.error = e
+    finally:
+        with _builds_lock:
+            _builds.pop(build.doc_hash, None)
+        build.done.set()
+
+
+def _start_build(path: str, doc_hash: str, index_path: str, embeddings, domain: str) -> _Build:
+    """Return the running build for *doc_hash*, starting one if needed."""
+    with _builds_lock:
+        build = _builds.get(doc_hash)
+        if build is None:
+            build = _builds[doc_hash] = _Build(doc_hash)
+            threading.Thread(
+                target=_stream_build,
+                args=(path, index_path, embeddings, domain, build),
+                name=f"faiss-build-{doc_hash[:8]}",
+                daemon=True,
+            ).start()
+    return build
+
+
+def _open_index(path: str, embeddings, domain: str = "general", latency_budget=None):
+    """
+    Return ``(db, build)``. *build* is None when *db* is the complete index,
+    otherwise the in-flight build whose latest checkpoint *db* was loaded from.
+    """
+    from tools.index_store import load_index
 
     # FIX: use full hash to prevent prefix collisions
-    index_path = os.path.join(FAISS_CACHE_DIR, _doc_hash(path))
-    if os.path.isdir(index_path) and os.path.exists(os.path.join(index_path, "index.faiss")):
-        return FAISS.load_local(
-            index_path, embeddings, allow_dangerous_deserialization=True
-        )
-    db = FAISS.from_documents(_load_and_chunk(path), embeddings)
-    db.save_local(index_path)
-    return db
+    # Each redaction tier and reduced EMBEDDING_DIM gets its own index
+    # ("<hash>-tiered-d256").
+    doc_hash = _doc_hash(path) + tier_suffix(domain) + dim_suffix()
+    index_path = os.path.join(FAISS_CACHE_DIR, doc_hash)
+    db = _hot_get(doc_hash)
+    if db is not None:
+        index_gc.touch(index_path)
+        return db, None
+    if _is_complete(index_path):
+        index_gc.touch(index_path)
+        return _hot_put(doc_hash, load_index(index_path, embeddings)), None
+
+    build = _start_build(path, doc_hash, index_path, embeddings, domain)
+    budget = RAG_LATENCY_BUDGET_S if latency_budget is None else latency_budget
+    build.done.wait(budget if budget > 0 else None)
+
+    # Budget spent: answer from the latest checkpoint, or wait for the first.
+    while not build.done.is_set():
+        if build.checkpointed.wait(0.5):
+            try:
+                return load_index(index_path + ".partial", embeddings), build
+            except Exception:
+                pass  # swapped or removed under us; retry
+
+    if build.error is not None:
+        raise build.error
+    if build.db is not None:
+        return _hot_put(doc_hash, build.db), None
+    return _hot_put(doc_hash, load_index(index_path, embeddings)), None
+
+
+def _get_or_build_index(path: str, embeddings, domain: str = "general", latency_budget=None):
+    """Return a cached FAISS index, building and persisting it on first use."""
+    return _open_index(path, embeddings, domain, latency_budget)[0]
 
 
-def run_rag_pipeline(user_path: str, question: str) -> str:
+# ── Embeddings ────────────────────────────────────────────────────────────────
+EMBEDDING_MODEL = "models/gemini-embedding-001"
+
+
+def make_embeddings():
+    """
+    Gemini embeddings, truncated to EMBEDDING_DIM when set, whose queries go
+    through the shared query LRU.
+    """
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    from tools.embedding_cache import QueryCachedEmbeddings
+    from tools.embedding_dims import reduce
+
+    return QueryCachedEmbeddings(reduce(GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)))
+
+
+def seed_query_cache(queries: list) -> int:
+    """Pre-embed the agents' fixed retrieval prompts; called at startup."""
+    from tools.embedding_cache import seed_queries
+
+    return seed_queries(make_embeddings(), queries)
+
+
+ANSWER_TEMPLATE = (
+    "You are a precise document assistant.\n"
+    "Use ONLY the context below to answer. "
+    "If the answer is not present say: "
+    '"I do not have that information in the provided documents."\n\n'
+    "Context:\n{context}\n\n"
+    "Question:\n{question}\n"
+)
+
+
+def finish_answer(raw_output: str) -> str:
+    """Redact PII from a generated answer (quiz-style JSON passes through)."""
+    if "[" in raw_output and "question" in raw_output and "answer" in raw_output:
+        return raw_output
+    return redact_pii_safe(raw_output)
+
+
+def run_rag_pipeline(user_path: str, question: str, domain: str = "general") -> str:
     """
     Run RAG over *user_path* and answer *question*.
 
@@ -186,14 +323,16 @@ def run_rag_pipeline(user_path: str, question: str) -> str:
         Absolute path to the PDF (or text) file to query.
     question : str
         The user's question / prompt.
+    domain : str
+        Agent type ("legal", "finance", ...); selects the PII redaction tier.
     """
-    from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
+    from langchain_google_genai import ChatGoogleGenerativeAI
     from langchain_core.prompts import PromptTemplate
     from langchain_core.runnables import RunnablePassthrough
     from langchain_core.output_parsers import StrOutputParser
 
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
-    db = _get_or_build_index(user_path, embeddings)
+    embeddings = make_embeddings()
+    db, build = _open_index(user_path, embeddings, domain)
 
     # candidate pool while k=6 keeps the context window lean.
     retriever = db.as_retriever(
@@ -204,17 +343,7 @@ def run_rag_pipeline(user_path: str, question: str) -> str:
     llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.3, max_output_tokens=2048)
 
     # variables — no more double-injection of the question string.
-    prompt = PromptTemplate(
-        template=(
-            "You are a precise document assistant.\n"
-            "Use ONLY the context below to answer. "
-            "If the answer is not present say: "
-            '"I do not have that information in the provided documents."\n\n'
-            "Context:\n{context}\n\n"
-            "Question:\n{question}\n"
-        ),
-        input_variables=["context", "question"],
-    )
+    prompt = PromptTemplate(template=ANSWER_TEMPLATE, input_variables=["context", "question"])
 
     chain = (
         {"context": retriever, "question": RunnablePassthrough()}
@@ -225,7 +354,135 @@ def run_rag_pipeline(user_path: str, question: str) -> str:
 
     raw_output = chain.invoke(question or "Summarise the document.")
 
-    if "[" in raw_output and "question" in raw_output and "answer" in raw_output:
-        return raw_output
+    if build is not None:
+        raw_output += (
+            f"\n\n_(Based on pages 1–{build.checkpoint_pages} of {build.pages_total}; "
+            "the rest of the document is still being indexed.)_"
+        )
+
+    return finish_answer(raw_output)
+
+# ── Session retrieval ─────────────────────────────────────────────────────────
+# A chat with several documents is answered from one merged retrieval: the
+# query is embedded once, each document's own index returns its best
+# candidates (optionally metadata-filtered per document), and MMR picks the
+# final k across all of them. Only the candidate vectors are reconstructed;
+# no index is copied or merged on disk. One LLM call answers the question.
+SESSION_RAG_K = int(os.getenv("SESSION_RAG_K", "10"))
+SESSION_RAG_FETCH_K = int(os.getenv("SESSION_RAG_FETCH_K", "20"))
+
+
+def _matches(metadata: dict, where) -> bool:
+    if where is None:
+        return True
+    if callable(where):
+        return where(metadata)
+    return all(
+        metadata.get(key) in value if isinstance(value, (list, tuple, set)) else metadata.get(key) == value
+        for key, value in where.items()
+    )
+
+
+def _candidates(db, query, fetch_k: int, where=None) -> list:
+    """``(score, doc, vector)`` for the best *fetch_k* rows of *db* passing *where*."""
+    import faiss
+    import numpy as np
+
+    q = np.asarray([query], dtype=np.float32)
+    if getattr(db, "_normalize_L2", False):
+        faiss.normalize_L2(q)
+    n = db.index.ntotal
+    # Filters are applied after the search, so over-fetch when there is one.
+    scores, rows = db.index.search(q, min(n, fetch_k if where is None else fetch_k * 4))
+    higher_is_better = db.index.metric_type == faiss.METRIC_INNER_PRODUCT
+    out = []
+    for score, row in zip(scores[0], rows[0]):
+        if row < 0:
+            continue
+        doc = db.docstore.search(db.index_to_docstore_id[int(row)])
+        if isinstance(doc, str) or not _matches(doc.metadata, where):
+            continue
+        out.append((float(score) if higher_is_better else -float(score), doc, db.index.reconstruct(int(row))))
+        if len(out) == fetch_k:
+            break
+    return out
+
+
+def session_retrieve(paths: list, query: str, embeddings=None, domain: str = "general",
+                     k: int = None, fetch_k: int = None, filters: dict = None):
+    """
+    Merged MMR top-*k* across the indexes of every document in *paths*.
+
+    *filters* maps a path to a metadata filter for that document only — a
+    ``{key: value | [values]}`` dict or a callable taking the metadata.
+    Returns ``(docs, builds)``; each doc carries ``doc_index`` (its position
+    in *paths*) and *builds* lists documents still being indexed.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import numpy as np
+    from langchain_community.vectorstores.utils import maximal_marginal_relevance
+    from langchain_core.documents import Document
+
+    embeddings = embeddings or make_embeddings()
+    k = k or SESSION_RAG_K
+    fetch_k = fetch_k or SESSION_RAG_FETCH_K
+    filters = filters or {}
+
+    # Index opens (and any first-time builds) overlap with the query embedding.
+    with ThreadPoolExecutor(max_workers=len(paths) + 1) as pool:
+        opened = [pool.submit(_open_index, p, embeddings, domain) for p in paths]
+        query_vector = pool.submit(embeddings.embed_query, query).result()
+        opened = [f.result() for f in opened]
+
+    pool_docs, vectors, builds = [], [], []
+    for i, (path, (db, build)) in enumerate(zip(paths, opened)):
+        if build is not None:
+            builds.append(build)
+        for _score, doc, vector in _candidates(db, query_vector, fetch_k, filters.get(path)):
+            pool_docs.append(Document(page_content=doc.page_content, metadata={**doc.metadata, "doc_index": i}))
+            vectors.append(vector)
+    if not pool_docs:
+        return [], builds
+
+    picked = maximal_marginal_relevance(
+        np.asarray(query_vector, dtype=np.float32), vectors, lambda_mult=0.6, k=min(k, len(pool_docs))
+    )
+    return [pool_docs[i] for i in picked], builds
+
+
+def _format_session_context(docs: list) -> str:
+    parts = []
+    for doc in docs:
+        label = f"Document {doc.metadata.get('doc_index', 0) + 1}"
+        if "page" in doc.metadata:
+            label += f", page {int(doc.metadata['page']) + 1}"
+        parts.append(f"[{label}]\n{doc.page_content}")
+    return "\n\n".join(parts)
+
+
+def run_session_rag(paths: list, question: str, domain: str = "general", filters: dict = None) -> str:
+    """
+    Answer *question* over every document in *paths* with one retrieval and
+    one LLM call. A single path is the same as ``run_rag_pipeline``.
+    """
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from langchain_core.output_parsers import StrOutputParser
+
+    paths = list(dict.fromkeys(paths))
+    if len(paths) == 1 and not filters:
+        return run_rag_pipeline(paths[0], question, domain)
+
+    question = question or "Summarise the documents."
+    docs, builds = session_retrieve(paths, question, domain=domain, filters=filters)
+    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.3, max_output_tokens=2048)
+    raw_output = (llm | StrOutputParser()).invoke(
+        ANSWER_TEMPLATE.format(context=_format_session_context(docs), question=question)
+    )
+
+    for build in builds:
+        raw_output += (
+            f"\n\n_(One document is indexed up to page {build.checkpoint_pages} of "
+            f"{build.pages_total}; the rest is still being indexed.)_"
+        )
 
-    return redact_pii_safe(raw_output)
\ No newline at end of file
+    return finish_answer(raw_output)
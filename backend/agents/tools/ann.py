@@ -0,0 +1,111 @@
+import math
+import os
+
+# ── Approximate-nearest-neighbour index selection ─────────────────────────────
+# Flat search costs O(chunks) per query, which hurts on 1,000-page filings
+# and merged corpora. Above ANN_MIN_CHUNKS the finished index is rebuilt as
+# HNSW, and above ANN_IVF_MIN_CHUNKS as IVF with 8-bit scalar quantisation;
+# FAISS_INDEX_TYPE pins one type instead:
+#
+#   auto | flat | hnsw | ivf (IVF-Flat) | ivfpq (IVF-PQ) | sq8 (IVF-SQ8)
+#
+# IVF types are trained at build time and get a direct map so MMR can
+# reconstruct the fetched vectors.
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "auto").lower()
+ANN_MIN_CHUNKS = int(os.getenv("ANN_MIN_CHUNKS", "5000"))
+ANN_IVF_MIN_CHUNKS = int(os.getenv("ANN_IVF_MIN_CHUNKS", "200000"))
+ANN_HNSW_M = int(os.getenv("ANN_HNSW_M", "32"))
+ANN_EF_SEARCH = int(os.getenv("ANN_EF_SEARCH", "256"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq", "sq8")
+
+
+def choose_type(n: int, kind: str = None) -> str:
+    kind = (kind or FAISS_INDEX_TYPE).lower()
+    if kind in INDEX_TYPES:
+        return kind
+    if n < ANN_MIN_CHUNKS:
+        return "flat"
+    if n < ANN_IVF_MIN_CHUNKS:
+        return "hnsw"
+    return "sq8"
+
+
+def _nlist(n: int) -> int:
+    # ~4*sqrt(n) lists, but keep >= 39 training points per centroid.
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def _pq_m(d: int) -> int:
+    for m in (96, 64, 48, 32, 24, 16, 8, 4, 2):
+        if d % m == 0:
+            return m
+    return 1
+
+
+def factory_string(kind: str, n: int, d: int) -> str:
+    if kind == "hnsw":
+        return f"HNSW{ANN_HNSW_M},Flat"
+    if kind == "ivf":
+        return f"IVF{_nlist(n)},Flat"
+    if kind == "ivfpq":
+        return f"IVF{_nlist(n)},PQ{_pq_m(d)}"
+    if kind == "sq8":
+        return f"IVF{_nlist(n)},SQ8"
+    return "Flat"
+
+
+def tune(index):
+    """Apply search-time parameters (efSearch / nprobe) to a built or loaded index."""
+    import faiss
+
+    try:
+        faiss.extract_index_ivf(index).nprobe = ANN_NPROBE
+        return index
+    except RuntimeError:
+        pass
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = ANN_EF_SEARCH
+    return index
+
+
+def build_index(vectors, metric=None, kind: str = None):
+    """Train (if needed) and fill a FAISS index for *vectors* (float32, n x d)."""
+    import faiss
+    import numpy as np
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+    metric = faiss.METRIC_L2 if metric is None else metric
+    kind = choose_type(n, kind)
+    if kind != "flat" and kind != "hnsw" and n < 39:
+        kind = "flat"  # too few points to train IVF centroids
+    index = faiss.index_factory(d, factory_string(kind, n, d), metric)
+    if not index.is_trained:
+        sample = vectors
+        if n > 256 * 1024:
+            sample = vectors[np.random.default_rng(0).choice(n, 256 * 1024, replace=False)]
+        index.train(sample)
+    index.add(vectors)
+    if kind in ("ivf", "ivfpq", "sq8"):
+        faiss.extract_index_ivf(index).make_direct_map()
+    return tune(index)
+
+
+def rebuild(db, kind: str = None) -> str:
+    """
+    Swap the flat index of a LangChain FAISS store for the type chosen for its
+    size. Row order (and so index_to_docstore_id) is unchanged. Returns the
+    type now in use ("flat" when nothing was rebuilt).
+    """
+    import faiss
+
+    n = db.index.ntotal
+    kind = choose_type(n, kind)
+    if kind == "flat" or not isinstance(faiss.downcast_index(db.index), faiss.IndexFlat):
+        return "flat"
+    vectors = db.index.reconstruct_n(0, n)
+    db.index = build_index(vectors, db.index.metric_type, kind)
+    return kind
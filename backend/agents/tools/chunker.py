@@ -0,0 +1,184 @@
+import os
+import re
+
+# ── Structure-aware chunker ───────────────────────────────────────────────────
+# One pass over PyMuPDF text blocks per page. A chunk closes at a heading or
+# numbered clause (once it holds CHUNK_MIN_TOKENS), before it would exceed
+# CHUNK_TOKENS, and always at a page break. Every chunk records its page, the
+# section heading it falls under, and char offsets into the page text
+# (block texts concatenated in reading order, before redaction).
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "512"))
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "256"))
+
+_SECTION_RE = re.compile(
+    r"^(?:article|section|clause|schedule|annex(?:ure)?|appendix|part|chapter)\s+[\dIVXLC]+\b",
+    re.IGNORECASE,
+)
+_NUMBERED_RE = re.compile(r"^\d{1,2}(?:\.\d{1,2})*[.)]?\s+[A-Z(“\"]")
+_SENTENCE_RE = re.compile(r"(?<=[.!?;:])\s+|\n+")
+
+# Local, deterministic token estimate: letter runs count one token per six
+# letters (most English words are a single BPE token), digits go in groups
+# of three as cl100k splits them, and every other non-space character is
+# one token. Unlike tiktoken it needs no table download, so chunk
+# boundaries, and every hash and cache key derived from them, are the same
+# on every host.
+_TOKEN_RE = re.compile(r"([A-Za-z]+)|\d{1,3}|[^\sA-Za-z\d]")
+
+
+def count_tokens(text: str) -> int:
+    """Approximate cl100k token count, computed locally."""
+    return sum((len(m.group(1)) + 5) // 6 if m.group(1) else 1 for m in _TOKEN_RE.finditer(text))
+
+
+def is_heading(text: str) -> bool:
+    """True for section headings, numbered clauses and short title lines."""
+    line = text.strip()
+    if not line or "\n" in line or len(line) > 90:
+        return False
+    if _SECTION_RE.match(line) or _NUMBERED_RE.match(line):
+        return True
+    letters = [c for c in line if c.isalpha()]
+    if len(letters) >= 4 and sum(c.isupper() for c in letters) / len(letters) > 0.8:
+        return True  # ALL-CAPS heading
+    words = line.split()
+    return (
+        len(words) <= 6
+        and line[0].isupper()
+        and line[-1] not in ".,;"
+        and ":" not in line[:-1]
+        and not any(ch.isdigit() for ch in line)
+    )
+
+
+def _split_oversized(text: str, start: int, budget: int) -> list:
+    """Split one block that alone exceeds *budget* at sentence/line breaks."""
+    pieces = []
+    cur_start, cur_end, cur_tokens = start, start, 0
+    pos = 0
+    for m in list(_SENTENCE_RE.finditer(text)) + [None]:
+        end = m.end() if m else len(text)
+        if end <= pos:
+            continue
+        tokens = count_tokens(text[pos:end])
+        if cur_tokens and cur_tokens + tokens > budget:
+            pieces.append((cur_start, cur_end))
+            cur_start, cur_tokens = start + pos, 0
+        cur_end = start + end
+        cur_tokens += tokens
+        pos = end
+    if cur_end > cur_start:
+        pieces.append((cur_start, cur_end))
+
+    # A single "sentence" longer than the budget: fall back to fixed windows.
+    out = []
+    window = budget * 4
+    for a, b in pieces:
+        while b - a > window:
+            out.append((a, a + window))
+            a += window
+        out.append((a, b))
+    return out
+
+
+def chunk_blocks(blocks: list, budget: int = None, min_tokens: int = None) -> tuple:
+    """
+    Chunk one page's block texts.
+
+    Returns ``(page_text, spans)`` where *spans* are ``(char_start, char_end,
+    section)`` into ``page_text``.
+    """
+    budget = budget or CHUNK_TOKENS
+    min_tokens = CHUNK_MIN_TOKENS if min_tokens is None else min_tokens
+    page_text = "".join(blocks)
+    spans = []
+    section = None
+    cur_start, cur_end, cur_tokens, cur_section = 0, 0, 0, None
+    pos = 0
+
+    def flush():
+        nonlocal cur_tokens
+        if cur_tokens and page_text[cur_start:cur_end].strip():
+            spans.append((cur_start, cur_end, cur_section))
+        cur_tokens = 0
+
+    for text in blocks:
+        start, end = pos, pos + len(text)
+        pos = end
+        if not text.strip():
+            cur_end = end if cur_tokens else cur_end
+            continue
+        tokens = count_tokens(text)
+        heading = is_heading(text)
+        if cur_tokens and (
+            (heading and cur_tokens >= min_tokens)
+            or (tokens > budget and cur_tokens >= min_tokens)
+            or (tokens <= budget and cur_tokens + tokens > budget)
+        ):
+            flush()
+        if heading:
+            section = text.strip()
+        if tokens > budget:
+            pieces = _split_oversized(text, start, budget)
+            labels = [section] * len(pieces)
+            if cur_tokens:
+                # Keep a short lead-in (e.g. a heading) with what follows if
+                # both fit the budget; otherwise it is a chunk of its own.
+                # Either way it keeps the section it started under.
+                a, b = pieces[0]
+                if cur_tokens + count_tokens(page_text[a:b]) <= budget:
+                    pieces[0], labels[0] = (cur_start, b), cur_section
+                    cur_tokens = 0
+                else:
+                    flush()
+            spans.extend((a, b, label) for (a, b), label in zip(pieces, labels))
+            continue
+        if not cur_tokens:
+            cur_start, cur_section = start, section
+        cur_end = end
+        cur_tokens += tokens
+    flush()
+    return page_text, spans
+
+
+def page_blocks(page) -> list:
+    """Text blocks of a PyMuPDF page in reading order, newline-terminated."""
+    blocks = []
+    for b in page.get_text("blocks", sort=True):
+        if b[6] != 0:  # image block
+            continue
+        text = b[4]
+        blocks.append(text if text.endswith("\n") else text + "\n")
+    return blocks
+
+
+def chunk_pdf_pages(path: str, start: int, end: int) -> list:
+    """Structured chunks for pages [start, end) as Documents (not yet redacted)."""
+    import fitz
+    from langchain_core.documents import Document
+
+    docs = []
+    with fitz.open(path) as pdf:
+        base = {k: v for k, v in (pdf.metadata or {}).items() if isinstance(v, (str, int))}
+        for i in range(start, min(end, pdf.page_count)):
+            page_text, spans = chunk_blocks(page_blocks(pdf[i]))
+            for a, b, section in spans:
+                raw = page_text[a:b]
+                content = raw.strip()
+                # Offsets locate the stripped content, not the raw span.
+                a += len(raw) - len(raw.lstrip())
+                b = a + len(content)
+                docs.append(Document(
+                    page_content=content,
+                    metadata={
+                        **base,
+                        "source": path,
+                        "file_path": path,
+                        "page": i,
+                        "total_pages": pdf.page_count,
+                        "char_start": a,
+                        "char_end": b,
+                        "section": section or "",
+                    },
+                ))
+    return docs
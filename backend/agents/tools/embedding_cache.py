@@ -0,0 +1,309 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from tools.embedding_dims import discover_dim
+
+# ── Persistent embedding cache ────────────────────────────────────────────────
+# Chunk embeddings keyed by (embedding model, output dimension, SHA-256 of the
+# chunk text), shared by the FAISS and Qdrant builds. A revised document, an
+# evicted index or the other vector backend looks every chunk up here before
+# anything is sent to the embedding API. Vectors are evicted
+# least-recently-used once they exceed EMBEDDING_CACHE_MAX_MB.
+#
+#   EMBEDDING_CACHE_PATH    SQLite file
+#   EMBEDDING_CACHE_DTYPE   float32 | float16 (half the disk, ~1e-3 error)
+#   EMBEDDING_CACHE_MAX_MB  stored-vector budget (0 disables the cache)
+_HERE = os.path.dirname(os.path.abspath(__file__))
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join(_HERE, "embedding_cache.db")
+)
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32").lower()
+EMBEDDING_CACHE_MAX_BYTES = int(float(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+_DTYPES = {"float32": np.float32, "float16": np.float16}
+
+_conn = None
+_conn_pid = None
+_lock = threading.Lock()
+
+# Reuse figures for the most recent builds, newest last.
+RECENT_BUILDS: deque = deque(maxlen=20)
+
+
+def enabled() -> bool:
+    return EMBEDDING_CACHE_MAX_BYTES > 0
+
+
+def _connect() -> sqlite3.Connection:
+    global _conn, _conn_pid
+    if _conn is None or _conn_pid != os.getpid():
+        conn = sqlite3.connect(EMBEDDING_CACHE_PATH, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            " model TEXT NOT NULL, dim INTEGER NOT NULL, hash TEXT NOT NULL,"
+            " dtype TEXT NOT NULL, vector BLOB NOT NULL, last_access REAL NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (model, dim, hash))"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(vectors)")}
+        if "last_access" not in columns:  # caches written before the size budget
+            conn.execute("ALTER TABLE vectors ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS vectors_lru ON vectors(last_access)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        conn.commit()
+        _conn, _conn_pid = conn, os.getpid()
+    return _conn
+
+
+def _bump(conn, **counts):
+    conn.executemany(
+        "INSERT INTO counters(name, value) VALUES(?, ?)"
+        " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        [(k, v) for k, v in counts.items() if v],
+    )
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def get_vectors(model: str, dim: int, hashes: list, text_bytes: dict = None) -> dict:
+    """
+    Return {hash: vector} for the hashes cached for (*model*, *dim*).
+    *text_bytes* ({hash: len}) feeds the bytes-saved counter.
+    """
+    found: dict = {}
+    if not enabled():
+        return found
+    unique = list(dict.fromkeys(hashes))
+    try:
+        with _lock:
+            conn = _connect()
+            for i in range(0, len(unique), 500):
+                batch = unique[i:i + 500]
+                marks = ",".join("?" * len(batch))
+                for h, dtype, blob in conn.execute(
+                    f"SELECT hash, dtype, vector FROM vectors"
+                    f" WHERE model = ? AND dim = ? AND hash IN ({marks})",
+                    [model, dim, *batch],
+                ):
+                    vec = np.frombuffer(blob, dtype=_DTYPES[dtype])
+                    if len(vec) == dim:  # a row of another size is a miss, never mixed in
+                        found[h] = vec.astype(np.float32).tolist()
+            if found:
+                conn.executemany(
+                    "UPDATE vectors SET last_access = ? WHERE model = ? AND dim = ? AND hash = ?",
+                    [(time.time(), model, dim, h) for h in found],
+                )
+            hits = sum(1 for h in hashes if h in found)
+            saved = sum((text_bytes or {}).get(h, 0) for h in hashes if h in found)
+            _bump(conn, hits=hits, misses=len(hashes) - hits, text_bytes_saved=saved)
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"Embedding cache read failed: {e}")
+    return found
+
+
+def put_vectors(model: str, vectors: dict):
+    """
+    Store {hash: vector} for *model*, then evict LRU vectors over budget.
+    The dimension is taken from the vectors.
+    """
+    if not enabled() or not vectors:
+        return
+    now = time.time()
+    dim = len(next(iter(vectors.values())))
+    dtype = EMBEDDING_CACHE_DTYPE if EMBEDDING_CACHE_DTYPE in _DTYPES else "float32"
+    try:
+        with _lock:
+            conn = _connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO vectors(model, dim, hash, dtype, vector, last_access)"
+                " VALUES(?, ?, ?, ?, ?, ?)",
+                [
+                    (model, dim, h, dtype, np.asarray(v, dtype=_DTYPES[dtype]).tobytes(), now)
+                    for h, v in vectors.items()
+                ],
+            )
+            _evict(conn)
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"Embedding cache write failed: {e}")
+
+
+def _evict(conn):
+    total = conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM vectors").fetchone()[0]
+    if total <= EMBEDDING_CACHE_MAX_BYTES:
+        return
+    # Trim to 90% of the budget so we don't evict on every insert.
+    target = total - int(EMBEDDING_CACHE_MAX_BYTES * 0.9)
+    freed, victims = 0, []
+    for rowid, size in conn.execute(
+        "SELECT rowid, LENGTH(vector) FROM vectors ORDER BY last_access"
+    ):
+        victims.append((rowid,))
+        freed += size
+        if freed >= target:
+            break
+    conn.executemany("DELETE FROM vectors WHERE rowid = ?", victims)
+    _bump(conn, evictions=len(victims))
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wrap an embeddings backend so ``embed_documents`` only embeds chunks the
+    cache has not seen. Create one per index build; ``reused``/``embedded``
+    count that build's chunks. *dim* is the output dimension when the caller
+    fixes it; otherwise it is discovered from *base* (one probe per model),
+    so full-size and truncated builds of one model never share vectors.
+    """
+
+    def __init__(self, base: Embeddings, model: str = None, dim: int = None):
+        self.base = base
+        self.model = model or getattr(base, "model", None) or type(base).__name__
+        self.dim = dim or getattr(base, "dim", None)
+        self.reused = 0
+        self.embedded = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        total = self.reused + self.embedded
+        return self.reused / total if total else 0.0
+
+    def embed_documents(self, texts: list) -> list:
+        hashes = [chunk_hash(t) for t in texts]
+        if not self.dim:
+            self.dim = discover_dim(self.base)
+        dim = self.dim
+        sizes = {h: len(t.encode("utf-8", "surrogatepass")) for h, t in zip(hashes, texts)}
+        known = get_vectors(self.model, dim, hashes, sizes)
+        missing = {h: t for h, t in zip(hashes, texts) if h not in known}
+        if missing:
+            fresh = dict(zip(missing, self.base.embed_documents(list(missing.values()))))
+            put_vectors(self.model, fresh)
+            known.update(fresh)
+        self.embedded += len(missing)
+        self.reused += len(texts) - len(missing)
+        return [known[h] for h in hashes]
+
+    def embed_query(self, text: str) -> list:
+        return self.base.embed_query(text)
+
+    def report(self, label: str) -> dict:
+        """Record and print this build's reuse ratio."""
+        entry = {
+            "index": label,
+            "chunks": self.reused + self.embedded,
+            "reused": self.reused,
+            "embedded": self.embedded,
+            "reuse_ratio": round(self.reuse_ratio, 4),
+        }
+        RECENT_BUILDS.append(entry)
+        print(
+            f"Index {label[:16]}: reused {self.reused}/{entry['chunks']} chunk embeddings "
+            f"({entry['reuse_ratio']:.0%})"
+        )
+        return entry
+
+
+# ── Query embedding LRU ───────────────────────────────────────────────────────
+# The agents retrieve with fixed domain prompts (LEGAL_RAG, FINANCE_RAG, ...),
+# so the same long query would otherwise be embedded remotely on every
+# analysis. One in-process LRU, shared by every QueryCachedEmbeddings
+# instance and seeded at startup, answers those without a round trip.
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "256"))
+
+_queries: OrderedDict = OrderedDict()
+_queries_lock = threading.Lock()
+QUERY_STATS = {"hits": 0, "misses": 0}
+
+
+def cached_query(model: str, text: str, embed_query, dim: int = None) -> list:
+    """
+    Return the embedding of *text* for *model* at *dim* (None = full size),
+    calling *embed_query* on a miss.
+    """
+    key = (model, dim, chunk_hash(text))
+    with _queries_lock:
+        vec = _queries.get(key)
+        if vec is not None:
+            _queries.move_to_end(key)
+            QUERY_STATS["hits"] += 1
+            return list(vec)
+        QUERY_STATS["misses"] += 1
+    vec = embed_query(text)
+    if QUERY_CACHE_SIZE > 0:
+        with _queries_lock:
+            _queries[key] = tuple(vec)
+            _queries.move_to_end(key)
+            while len(_queries) > QUERY_CACHE_SIZE:
+                _queries.popitem(last=False)
+    return vec
+
+
+class QueryCachedEmbeddings(Embeddings):
+    """Serve ``embed_query`` from the shared query LRU; documents pass through."""
+
+    def __init__(self, base: Embeddings, model: str = None):
+        self.base = base
+        self.model = model or getattr(base, "model", None) or type(base).__name__
+        self.dim = getattr(base, "dim", None)
+
+    def embed_documents(self, texts: list) -> list:
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list:
+        return cached_query(self.model, text, self.base.embed_query, self.dim)
+
+
+def seed_queries(embeddings: Embeddings, texts: list) -> int:
+    """Embed *texts* into the query LRU up front; returns how many were added."""
+    if not isinstance(embeddings, QueryCachedEmbeddings):
+        embeddings = QueryCachedEmbeddings(embeddings)
+    before = len(_queries)
+    for text in texts:
+        embeddings.embed_query(text)
+    return len(_queries) - before
+
+
+def stats() -> dict:
+    """Hit rate and bytes saved (all processes), store size and recent builds."""
+    if not enabled():
+        return {"enabled": False, "queries": _query_stats()}
+    try:
+        with _lock:
+            conn = _connect()
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            stored, stored_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM vectors"
+            ).fetchone()
+    except sqlite3.Error as e:
+        return {"enabled": True, "error": str(e)}
+    hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+    return {
+        "enabled": True,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "text_bytes_saved": counters.get("text_bytes_saved", 0),
+        "stored_vectors": stored,
+        "stored_bytes": stored_bytes,
+        "budget_bytes": EMBEDDING_CACHE_MAX_BYTES,
+        "evictions": counters.get("evictions", 0),
+        "dtype": EMBEDDING_CACHE_DTYPE,
+        "recent_builds": list(RECENT_BUILDS),
+        "queries": _query_stats(),
+    }
+
+
+def _query_stats() -> dict:
+    return {**QUERY_STATS, "entries": len(_queries), "capacity": QUERY_CACHE_SIZE}
@@ -0,0 +1,71 @@
+import os
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from dotenv import load_dotenv
+
+load_dotenv()  # EMBEDDING_DIM is read at import
+
+# ── Embedding dimensions ──────────────────────────────────────────────────────
+# gemini-embedding-001 is Matryoshka-trained, so a vector's leading components
+# carry most of its meaning. EMBEDDING_DIM (e.g. 256 or 512; 0 = the model's
+# full size) keeps only the first N components and L2-normalises what is
+# left, so index memory and search time shrink in proportion.
+#
+# A reduced size is part of every index's identity. FAISS cache directories
+# and Qdrant collection names get a "-d<N>" suffix, so indexes of different
+# sizes never mix. Otherwise the size is discovered from the backend instead
+# of being assumed.
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "0"))
+
+_probed: dict = {}  # model -> full output dimension
+_probe_lock = threading.Lock()
+
+
+def truncate(vectors, dim: int) -> list:
+    """First *dim* components of each vector (or of one vector), unit length."""
+    v = np.asarray(vectors, dtype=np.float32)[..., :dim]
+    norms = np.linalg.norm(v, axis=-1, keepdims=True)
+    return (v / np.where(norms == 0, 1, norms)).tolist()
+
+
+class TruncatedEmbeddings(Embeddings):
+    """Matryoshka-truncate every vector *base* returns to *dim* components."""
+
+    def __init__(self, base: Embeddings, dim: int):
+        self.base = base
+        self.dim = dim
+        self.model = getattr(base, "model", None) or type(base).__name__
+
+    def embed_documents(self, texts: list) -> list:
+        if not texts:
+            return []
+        return truncate(self.base.embed_documents(texts), self.dim)
+
+    def embed_query(self, text: str) -> list:
+        return truncate(self.base.embed_query(text), self.dim)
+
+
+def reduce(embeddings: Embeddings, dim: int = None) -> Embeddings:
+    """*embeddings* truncated to *dim* (default EMBEDDING_DIM; 0 = unchanged)."""
+    dim = EMBEDDING_DIM if dim is None else dim
+    return TruncatedEmbeddings(embeddings, dim) if dim > 0 else embeddings
+
+
+def suffix(dim: int = None) -> str:
+    """Index-name suffix for a reduced dimension ("" at full size)."""
+    dim = EMBEDDING_DIM if dim is None else dim
+    return f"-d{dim}" if dim > 0 else ""
+
+
+def discover_dim(embeddings: Embeddings) -> int:
+    """Output size of *embeddings*: its ``dim`` if fixed, else probed once per model."""
+    dim = getattr(embeddings, "dim", None)
+    if dim:
+        return dim
+    model = getattr(embeddings, "model", None) or type(embeddings).__name__
+    with _probe_lock:
+        if model not in _probed:
+            _probed[model] = len(embeddings.embed_query("dimension probe"))
+        return _probed[model]
@@ -0,0 +1,157 @@
+import os
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+# ── Batched embedding executor ────────────────────────────────────────────────
+# Ingestion packs chunks into maximum-size requests (Gemini's batch endpoint
+# takes up to 100 texts) and keeps a bounded number of them in flight. Failed
+# batches are retried with exponential backoff and jitter, which covers the
+# 429/503 responses the embedding API returns under load.
+#
+#   EMBED_BATCH_SIZE   texts per embedding request
+#   EMBED_CONCURRENCY  batches in flight at once
+#   EMBED_MAX_RETRIES  attempts after the first failure
+#   EMBED_BACKOFF_S    first retry delay, doubled per attempt
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_BACKOFF_S = float(os.getenv("EMBED_BACKOFF_S", "1.0"))
+
+# Throughput of the most recent runs, newest last.
+RECENT_RUNS: deque = deque(maxlen=20)
+
+# Executors at the default concurrency share one pool, so EMBED_CONCURRENCY
+# bounds requests across concurrent index builds, not per build.
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def _get_shared_pool() -> ThreadPoolExecutor:
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = ThreadPoolExecutor(
+                max_workers=max(1, EMBED_CONCURRENCY), thread_name_prefix="embed"
+            )
+        return _shared_pool
+
+
+class EmbeddingExecutor:
+    """
+    Run ``embed_batch(texts) -> vectors`` over a list of texts in batches of
+    *batch_size*, at most *concurrency* at a time, preserving input order.
+    """
+
+    def __init__(self, embed_batch, batch_size: int = None, concurrency: int = None,
+                 max_retries: int = None, backoff: float = None):
+        self.embed_batch = embed_batch
+        self.batch_size = max(1, batch_size or EMBED_BATCH_SIZE)
+        self.concurrency = max(1, concurrency or EMBED_CONCURRENCY)
+        self.max_retries = EMBED_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = EMBED_BACKOFF_S if backoff is None else backoff
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.last_run: dict = {}
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self.concurrency == max(1, EMBED_CONCURRENCY):
+            return _get_shared_pool()
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.concurrency, thread_name_prefix="embed"
+                )
+            return self._pool
+
+    def _run_batch(self, batch: list):
+        """Embed one batch with retries; returns (vectors, seconds, retries)."""
+        retries = 0
+        t0 = time.perf_counter()
+        while True:
+            try:
+                vectors = self.embed_batch(batch)
+                if len(vectors) != len(batch):
+                    raise ValueError(f"expected {len(batch)} vectors, got {len(vectors)}")
+                return vectors, time.perf_counter() - t0, retries
+            except Exception as e:
+                if retries >= self.max_retries:
+                    raise
+                delay = self.backoff * (2 ** retries) * (0.5 + random.random())
+                retries += 1
+                print(f"Embedding batch of {len(batch)} failed [{type(e).__name__}]: {e}. "
+                      f"Retry {retries}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def run(self, texts: list) -> list:
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        t0 = time.perf_counter()
+        if len(batches) == 1:
+            results = [self._run_batch(batches[0])]
+        else:
+            results = list(self._get_pool().map(self._run_batch, batches))
+        seconds = time.perf_counter() - t0
+
+        latencies = sorted(r[1] for r in results)
+        self.last_run = {
+            "chunks": len(texts),
+            "batches": len(batches),
+            "retries": sum(r[2] for r in results),
+            "seconds": round(seconds, 4),
+            "chunks_per_s": round(len(texts) / seconds, 1) if seconds else None,
+            "batch_p50_s": round(statistics.median(latencies), 4),
+            "batch_max_s": round(latencies[-1], 4),
+        }
+        RECENT_RUNS.append(self.last_run)
+        return [v for r in results for v in r[0]]
+
+    def report(self, label: str = "") -> dict:
+        run = self.last_run
+        if run:
+            print(
+                f"Embedded {run['chunks']} chunks{' for ' + label[:16] if label else ''} in "
+                f"{run['batches']} batches: {run['chunks_per_s']} chunks/s, batch p50 "
+                f"{run['batch_p50_s'] * 1000:.0f} ms, max {run['batch_max_s'] * 1000:.0f} ms, "
+                f"{run['retries']} retries"
+            )
+        return run
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+            self._pool = None
+
+
+class BatchedEmbeddings(Embeddings):
+    """Route ``embed_documents`` of any LangChain embeddings through an executor."""
+
+    def __init__(self, base: Embeddings, executor: EmbeddingExecutor = None):
+        self.base = base
+        # Keep the wrapped model's name so chunk-store keys don't change.
+        self.model = getattr(base, "model", None) or type(base).__name__
+        self.dim = getattr(base, "dim", None)
+        self.executor = executor or EmbeddingExecutor(base.embed_documents)
+
+    def embed_documents(self, texts: list) -> list:
+        vectors = self.executor.run(list(texts))
+        self.executor.report()
+        return vectors
+
+    def embed_query(self, text: str) -> list:
+        return self.base.embed_query(text)
+
+
+def stats() -> dict:
+    return {
+        "batch_size": EMBED_BATCH_SIZE,
+        "concurrency": EMBED_CONCURRENCY,
+        "recent_runs": list(RECENT_RUNS),
+    }
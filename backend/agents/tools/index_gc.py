@@ -0,0 +1,190 @@
+"""
+Size-budgeted garbage collection for the FAISS index cache.
+
+Every complete index directory carries a ``meta.json`` with its size; the
+file's mtime is bumped on each access and serves as the LRU clock. A pass:
+
+1. removes leftovers of crashed builds: ``.tmp-*`` / ``.old-*`` directories,
+   ``.partial`` checkpoints and directories without ``index.faiss``, once
+   they are older than INDEX_GC_STALE_S and no worker holds their build lock;
+2. evicts least-recently-used indexes until the cache is back under 90% of
+   INDEX_CACHE_MAX_MB.
+
+It runs in a background thread started by the API, or once from the shell:
+
+    python -m tools.index_gc [--dry-run] [--max-mb 2048]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+load_dotenv()  # limits are read at import, also under `python -m tools.index_gc`
+
+INDEX_CACHE_MAX_BYTES = int(float(os.getenv("INDEX_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+INDEX_GC_INTERVAL_S = float(os.getenv("INDEX_GC_INTERVAL_S", "600"))
+INDEX_GC_STALE_S = float(os.getenv("INDEX_GC_STALE_S", "3600"))
+
+META_FILE = "meta.json"
+_HASH_RE = re.compile(r"^[0-9a-f]{64}(?:-(?:full|tiered|fast))?(?:-d\d+)?")  # doc hash [+ tier] [+ reduced dim]
+
+LAST_RUN: dict = {}
+_thread = None
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def record_entry(index_path: str):
+    """Write meta.json for a freshly saved index."""
+    meta = {"size": _dir_size(index_path), "created": time.time()}
+    try:
+        with open(os.path.join(index_path, META_FILE), "w") as f:
+            json.dump(meta, f)
+    except OSError as e:
+        print(f"Index metadata write failed for {index_path}: {e}")
+
+
+def touch(index_path: str):
+    """Mark an index as used now (no-op once GC has removed it)."""
+    meta = os.path.join(index_path, META_FILE)
+    try:
+        os.utime(meta)
+    except FileNotFoundError:
+        # Evicted from disk while still served from the hot cache: nothing
+        # to mark. Otherwise the index predates metadata; write it now.
+        if os.path.isdir(index_path):
+            record_entry(index_path)
+    except OSError:
+        pass
+
+
+def _entry_info(index_path: str):
+    """Return (last_access, size) for a complete index."""
+    meta = os.path.join(index_path, META_FILE)
+    try:
+        with open(meta) as f:
+            size = int(json.load(f)["size"])
+        return os.path.getmtime(meta), size
+    except (OSError, ValueError, KeyError):
+        # Index saved before metadata existed: fall back to the directory.
+        return os.path.getmtime(index_path), _dir_size(index_path)
+
+
+def _remove(path: str):
+    """Rename out of the way first so readers never see a half-deleted index."""
+    doomed = f"{path}.old-gc-{uuid.uuid4().hex[:8]}"
+    try:
+        os.rename(path, doomed)
+    except OSError:
+        doomed = path
+    shutil.rmtree(doomed, ignore_errors=True)
+
+
+def collect(cache_dir: str = None, max_bytes: int = None, dry_run: bool = False) -> dict:
+    """One GC pass over *cache_dir*; returns what was (or would be) removed."""
+    from tools.single_flight import is_building
+
+    if cache_dir is None:
+        from tools.RAG import FAISS_CACHE_DIR as cache_dir
+    max_bytes = INDEX_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    now = time.time()
+    report = {"orphans_removed": 0, "orphan_bytes": 0, "evicted": 0,
+              "evicted_bytes": 0, "entries": 0, "bytes": 0, "budget_bytes": max_bytes}
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if not os.path.isdir(path):
+            continue
+        complete = _HASH_RE.fullmatch(name) and os.path.exists(os.path.join(path, "index.faiss"))
+        if complete:
+            entries.append((path, *_entry_info(path)))
+            continue
+        # Leftover of a crashed or running build.
+        m = _HASH_RE.match(name)
+        if now - os.path.getmtime(path) < INDEX_GC_STALE_S or (m and is_building(m.group(0))):
+            continue
+        size = _dir_size(path)
+        report["orphans_removed"] += 1
+        report["orphan_bytes"] += size
+        if not dry_run:
+            shutil.rmtree(path, ignore_errors=True)
+
+    total = sum(size for _p, _t, size in entries)
+    if max_bytes > 0 and total > max_bytes:
+        target = int(max_bytes * 0.9)
+        for path, _last, size in sorted(entries, key=lambda e: e[1]):
+            if total <= target:
+                break
+            if is_building(os.path.basename(path)):
+                continue
+            if not dry_run:
+                _remove(path)
+            total -= size
+            report["evicted"] += 1
+            report["evicted_bytes"] += size
+
+    report["entries"] = len(entries) - report["evicted"]
+    report["bytes"] = total
+    report["finished_at"] = time.time()
+    report["dry_run"] = dry_run
+    if not dry_run:
+        LAST_RUN.clear()
+        LAST_RUN.update(report)
+    return report
+
+
+def _loop(interval: float):
+    while True:
+        try:
+            report = collect()
+            if report["orphans_removed"] or report["evicted"]:
+                print(f"Index GC: removed {report['orphans_removed']} orphans, evicted "
+                      f"{report['evicted']} indexes ({report['bytes'] / 1e6:.0f} MB left)")
+        except Exception as e:
+            print(f"Index GC failed [{type(e).__name__}]: {e}")
+        time.sleep(interval)
+
+
+def start_background(interval: float = None):
+    """Start the periodic GC thread once per process (0 disables it)."""
+    global _thread
+    interval = INDEX_GC_INTERVAL_S if interval is None else interval
+    if interval <= 0 or (_thread is not None and _thread.is_alive()):
+        return
+    _thread = threading.Thread(target=_loop, args=(interval,), name="index-gc", daemon=True)
+    _thread.start()
+
+
+def stats() -> dict:
+    return dict(LAST_RUN) or {"budget_bytes": INDEX_CACHE_MAX_BYTES, "runs": 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--max-mb", type=float, help="override INDEX_CACHE_MAX_MB")
+    parser.add_argument("--cache-dir", help="default: tools/faiss_cache")
+    args = parser.parse_args()
+    max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None
+    print(json.dumps(collect(args.cache_dir, max_bytes, args.dry_run), indent=2))
+
+
+if __name__ == "__main__":
+    main()
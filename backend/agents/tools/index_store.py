@@ -0,0 +1,149 @@
+import json
+import mmap
+import os
+from collections.abc import Mapping
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+# ── Pickle-free index format ──────────────────────────────────────────────────
+# A cached index directory holds:
+#
+#   index.faiss   FAISS index, read back memory-mapped
+#   texts.bin     chunk texts, UTF-8, back to back
+#   meta.bin      chunk metadata, one compact JSON object per chunk
+#   offsets.npy   int64 (n + 1, 2): start offsets into texts.bin / meta.bin
+#   store.json    format version, chunk count, dimension, distance strategy
+#
+# Nothing is unpickled on load: texts and metadata stay in the page cache and
+# a Document is built only for the chunks a search actually returns.
+# Directories written by FAISS.save_local (index.pkl) still load the old way.
+FORMAT_VERSION = 1
+
+
+class MmapDocstore(Docstore):
+    """Read-only docstore over texts.bin / meta.bin; ids are row numbers as str."""
+
+    def __init__(self, path: str):
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self._files = []
+        self.texts = self._map(os.path.join(path, "texts.bin"))
+        self.meta = self._map(os.path.join(path, "meta.bin"))
+
+    def _map(self, file_path: str):
+        f = open(file_path, "rb")
+        self._files.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.texts) + len(self.meta) + self.offsets.nbytes
+
+    def search(self, search: str):
+        try:
+            i = int(search)
+        except ValueError:
+            return f"ID {search} not found."
+        if not 0 <= i < len(self):
+            return f"ID {search} not found."
+        (t0, m0), (t1, m1) = self.offsets[i], self.offsets[i + 1]
+        return Document(
+            page_content=bytes(self.texts[t0:t1]).decode("utf-8", "surrogatepass"),
+            metadata=json.loads(bytes(self.meta[m0:m1]) or b"{}"),
+        )
+
+    def add(self, texts: dict):
+        raise NotImplementedError("memory-mapped docstores are read-only")
+
+    def delete(self, ids: list):
+        raise NotImplementedError("memory-mapped docstores are read-only")
+
+
+class PositionalIds(Mapping):
+    """index_to_docstore_id for rows stored in order: i -> str(i), no dict."""
+
+    def __init__(self, n: int):
+        self.n = n
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.n:
+            raise KeyError(i)
+        return str(i)
+
+    def __iter__(self):
+        return iter(range(self.n))
+
+    def __len__(self) -> int:
+        return self.n
+
+
+def save_index(db, path: str):
+    """Write *db* (a LangChain FAISS vectorstore) to *path* in the mmap format."""
+    import faiss
+
+    os.makedirs(path, exist_ok=True)
+    faiss.write_index(db.index, os.path.join(path, "index.faiss"))
+
+    n = db.index.ntotal
+    offsets = np.zeros((n + 1, 2), dtype=np.int64)
+    with open(os.path.join(path, "texts.bin"), "wb") as texts, \
+            open(os.path.join(path, "meta.bin"), "wb") as meta:
+        t = m = 0
+        for i in range(n):
+            doc = db.docstore.search(db.index_to_docstore_id[i])
+            text = doc.page_content.encode("utf-8", "surrogatepass")
+            md = json.dumps(doc.metadata, separators=(",", ":"), default=str).encode("utf-8")
+            texts.write(text)
+            meta.write(md)
+            t += len(text)
+            m += len(md)
+            offsets[i + 1] = (t, m)
+    np.save(os.path.join(path, "offsets.npy"), offsets)
+
+    with open(os.path.join(path, "store.json"), "w") as f:
+        json.dump({
+            "format": FORMAT_VERSION,
+            "count": n,
+            "dim": db.index.d,
+            "distance_strategy": str(getattr(db.distance_strategy, "value", db.distance_strategy)),
+            "normalize_L2": bool(getattr(db, "_normalize_L2", False)),
+        }, f)
+
+
+def load_index(path: str, embeddings):
+    """Open the index at *path*, memory-mapped when it is in the new format."""
+    from langchain_community.vectorstores import FAISS
+
+    if not os.path.exists(os.path.join(path, "store.json")):
+        return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+
+    import faiss
+    from langchain_community.vectorstores.utils import DistanceStrategy
+    from tools.ann import tune
+
+    with open(os.path.join(path, "store.json")) as f:
+        info = json.load(f)
+    index_file = os.path.join(path, "index.faiss")
+    # MMAP_IFC maps flat code arrays too (faiss >= 1.10); older builds only
+    # map IVF lists with IO_FLAG_MMAP.
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    try:
+        index = faiss.read_index(index_file, flags)
+    except RuntimeError:  # index type without mmap support
+        index = faiss.read_index(index_file)
+    tune(index)
+    docstore = MmapDocstore(path)
+    return FAISS(
+        embeddings,
+        index,
+        docstore,
+        PositionalIds(len(docstore)),
+        normalize_L2=info.get("normalize_L2", False),
+        distance_strategy=DistanceStrategy(info["distance_strategy"]),
+    )
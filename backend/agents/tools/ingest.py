@@ -0,0 +1,207 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# ── Page-sharded ingestion ────────────────────────────────────────────────────
+# Parsing and PII redaction are CPU-bound and independent per page, so large
+# PDFs are split into page ranges and processed by a pool of worker processes.
+# Shards are reassembled in page order, so the chunk list is identical to the
+# serial path. iter_chunks() exposes the same pipeline as a generator so an
+# index can be built while later pages are still being processed.
+#
+#   INGEST_WORKERS          0 = auto (min(cpu_count, 4)), 1 = always serial
+#   INGEST_SHARD_MIN_PAGES  documents shorter than this stay serial
+#   INGEST_PAGES_PER_SHARD  page-range size handed to one worker task
+#   RAG_CHUNKER             "structured" (tools/chunker.py) or "recursive"
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0"))
+INGEST_SHARD_MIN_PAGES = int(os.getenv("INGEST_SHARD_MIN_PAGES", "32"))
+INGEST_PAGES_PER_SHARD = int(os.getenv("INGEST_PAGES_PER_SHARD", "16"))
+RAG_CHUNKER = os.getenv("RAG_CHUNKER", "structured").lower()
+
+CHUNK_SIZE = 2000
+CHUNK_OVERLAP = 200
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _resolve_workers(workers=None) -> int:
+    if workers is None:
+        workers = INGEST_WORKERS
+    if workers <= 0:
+        workers = min(os.cpu_count() or 1, 4)
+    return max(1, workers)
+
+
+def _launch_without_main(popen, process_obj):
+    """popen_forkserver.Popen._launch, minus the child's __main__ re-import."""
+    import io
+    from multiprocessing import forkserver, reduction, spawn, util
+    from multiprocessing.context import set_spawning_popen
+
+    prep_data = spawn.get_preparation_data(process_obj._name)
+    prep_data.pop("init_main_from_name", None)
+    prep_data.pop("init_main_from_path", None)
+    buf = io.BytesIO()
+    set_spawning_popen(popen)
+    try:
+        reduction.dump(prep_data, buf)
+        reduction.dump(process_obj, buf)
+    finally:
+        set_spawning_popen(None)
+
+    popen.sentinel, w = forkserver.connect_to_new_process(popen._fds)
+    parent_w = os.dup(w)
+    popen.finalizer = util.Finalize(popen, util.close_fds, (parent_w, popen.sentinel))
+    with open(w, "wb", closefd=True) as f:
+        f.write(buf.getbuffer())
+    popen.pid = forkserver.read_signed(popen.sentinel)
+
+
+if "forkserver" in multiprocessing.get_all_start_methods():
+    from multiprocessing import context as _mp_ctx, popen_forkserver
+
+    class _IngestPopen(popen_forkserver.Popen):
+        _launch = _launch_without_main
+
+    class _IngestProcess(_mp_ctx.ForkServerProcess):
+        @staticmethod
+        def _Popen(process_obj):
+            return _IngestPopen(process_obj)
+
+    class _IngestContext(_mp_ctx.ForkServerContext):
+        Process = _IngestProcess
+
+
+def _mp_context():
+    """
+    Forkserver, not fork: the pool is first created from a build thread of
+    the multi-threaded API process, and a forked child could inherit a lock
+    (redaction cache, PII init) held by another thread. Nor plain spawn or
+    forkserver, which re-run the parent's __main__ (Mongo setup, agent
+    imports under `python main.py`) in every worker. Workers are forked from
+    a server that has imported only the ingest modules, and skip __main__.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")  # Windows
+    ctx = _IngestContext()
+    ctx.set_forkserver_preload(["tools.ingest", "tools.pii"])
+    return ctx
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Reuse one pool per process so workers keep their PII engine warm."""
+    global _pool, _pool_workers
+    with _pool_lock:  # concurrent builds share one pool instead of leaking two
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context())
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+        _pool_workers = 0
+
+
+def page_count(path: str) -> int:
+    import fitz
+
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+
+def _load_pages(path: str, start: int, end: int) -> list:
+    """Load pages [start, end) as Documents, mirroring PyMuPDFLoader metadata."""
+    import fitz
+    from langchain_core.documents import Document
+
+    docs = []
+    with fitz.open(path) as pdf:
+        base = {k: v for k, v in (pdf.metadata or {}).items() if isinstance(v, (str, int))}
+        for i in range(start, min(end, pdf.page_count)):
+            docs.append(Document(
+                page_content=pdf[i].get_text(),
+                metadata={
+                    **base,
+                    "source": path,
+                    "file_path": path,
+                    "page": i,
+                    "total_pages": pdf.page_count,
+                },
+            ))
+    return docs
+
+
+def _process_range(path: str, start: int, end: int, redact_batch, chunker=None) -> list:
+    """Parse, split and redact one page range. Runs inside a worker process."""
+    if (chunker or RAG_CHUNKER) == "recursive":
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        docs = _load_pages(path, start, end)
+        redacted = redact_batch([d.page_content for d in docs])
+        for d, text in zip(docs, redacted):
+            d.page_content = text
+        return RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+        ).split_documents(docs)
+
+    from tools.chunker import chunk_pdf_pages
+
+    # Chunk boundaries come from the layout, so redact after splitting;
+    # char_start/char_end keep pointing into the original page text.
+    chunks = chunk_pdf_pages(path, start, end)
+    redacted = redact_batch([c.page_content for c in chunks])
+    for c, text in zip(chunks, redacted):
+        c.page_content = text
+    return chunks
+
+
+def iter_chunks(path: str, redact_batch, workers=None, chunker=None):
+    """
+    Yield ``(start_page, end_page, chunks)`` for consecutive page ranges of
+    *path*, in page order, as soon as each range is parsed and redacted.
+
+    *redact_batch* takes a list of page texts and returns them redacted. It
+    must be a module-level function (or a partial of one) so it can be
+    pickled into the worker processes. Small documents, or ``workers=1``, run
+    serially in the calling process. *chunker* overrides RAG_CHUNKER.
+    """
+    workers = _resolve_workers(workers)
+    total = page_count(path)
+    step = max(1, INGEST_PAGES_PER_SHARD)
+    ranges = [(start, min(start + step, total)) for start in range(0, total, step)]
+
+    if workers == 1 or total < INGEST_SHARD_MIN_PAGES:
+        for start, end in ranges:
+            yield start, end, _process_range(path, start, end, redact_batch, chunker)
+        return
+
+    pool = _get_pool(workers)
+    futures = [
+        pool.submit(_process_range, path, start, end, redact_batch, chunker)
+        for start, end in ranges
+    ]
+    try:
+        for (start, end), fut in zip(ranges, futures):  # submission order == page order
+            yield start, end, fut.result()
+    finally:
+        for fut in futures:
+            fut.cancel()
+
+
+def load_and_chunk(path: str, redact_batch, workers=None, chunker=None) -> list:
+    """Return the redacted, split chunks of *path* in page order."""
+    chunks: list = []
+    for _start, _end, part in iter_chunks(path, redact_batch, workers, chunker):
+        chunks.extend(part)
+    return chunks
@@ -0,0 +1,417 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from dotenv import load_dotenv
+from tools import redaction_cache
+
+load_dotenv()  # PII_TIERS / PII_BATCH_SIZE are read at import
+
+# ── Process-wide PII engine ───────────────────────────────────────────────────
+# One Presidio + spaCy instance per process, shared by the FAISS and Qdrant
+# pipelines. main.py warms it up in the FastAPI lifespan so the first upload
+# does not pay the model load.
+_analyzer = None
+_anonymizer = None
+_batch_analyzer = None
+_PII_ENTITIES = [
+    "PERSON", "NRP", "PHONE_NUMBER", "EMAIL_ADDRESS", "LOCATION",
+    "CREDIT_CARD", "IBAN_CODE", "BANK_ACCOUNT", "CRYPTO", "US_SSN",
+    "MEDICAL_LICENSE", "DATE_TIME", "URL",
+    "CASE_NUMBER", "CONTRACT_NUMBER", "STUDENT_ID", "SALARY", "TRANSACTION_ID",
+]
+PII_BATCH_SIZE = int(os.getenv("PII_BATCH_SIZE", "32"))
+_init_lock = threading.Lock()
+
+# Filled in by init_pii(); reported by warm_up() and /health.
+ENGINE_STATS: dict = {}
+
+# Domain-specific pattern recognizers, registered with Presidio and also
+# compiled into the fast-tier scanner below.
+_CUSTOM_PATTERNS = [
+    ("CASE_NUMBER",     "case_number",
+     r"\b(case|c\.?no\.?|docket)\s*[:\-]?\s*[A-Z0-9\-\/]+\b", 0.6),
+    ("CONTRACT_NUMBER", "contract_number",
+     r"\b(contract|policy)\s*(no|number)?\s*[:\-]?\s*[A-Z0-9\-\/]{5,}\b", 0.6),
+    ("STUDENT_ID",      "student_id",
+     r"\b(student|roll|registration)\s*(id|no|number)?\s*[:\-]?\s*[A-Z0-9\-]{4,}\b", 0.6),
+    ("SALARY",          "salary",
+     r"\b(salary|compensation|ctc|pay|wage)\s*[:\-]?\s*(\$|₹|€)?\s?\d[\d,]*(\.\d+)?\b", 0.55),
+    ("TRANSACTION_ID",  "transaction_id",
+     r"\b(transaction|txn|reference)\s*(id|no|number)?\s*[:\-]?\s*[A-Z0-9\-]{6,}\b", 0.6),
+]
+
+# ── Redaction tiers ───────────────────────────────────────────────────────────
+#   full    Presidio + spaCy NER on every text (original behaviour)
+#   tiered  regex scanner everywhere; NER only on lines that the scanner or a
+#           name/location heuristic flags
+#   fast    regex scanner only
+# The agent type picks the tier; override with e.g. PII_TIERS="general=fast".
+PII_TIERS = {"legal": "full", "finance": "tiered", "education": "tiered", "general": "tiered"}
+for _item in filter(None, os.getenv("PII_TIERS", "").split(",")):
+    _domain, _, _tier = _item.partition("=")
+    if _tier.strip() in ("full", "tiered", "fast"):
+        PII_TIERS[_domain.strip().lower()] = _tier.strip()
+
+# Email/phone/card/IBAN plus the cheap URL and numeric-date recognizers.
+_FAST_PATTERNS = [(e, rx, score) for e, _name, rx, score in _CUSTOM_PATTERNS] + [
+    ("EMAIL_ADDRESS", r"\b[A-Z0-9._%+\-]+@[A-Z0-9.\-]+\.[A-Z]{2,}\b", 0.9),
+    ("URL",           r"\b(?:https?://|www\.)[^\s<>\"']+"
+                      r"|\b[A-Z0-9\-]+(?:\.[A-Z0-9\-]+)*\.(?:com|org|net|in|io|gov|edu|co|uk)\b(?:/[^\s<>\"']*)?", 0.5),
+    # Day/month in range and one separator throughout; dotted dates need a
+    # four-digit year so clause and version numbers ("12.3.10") pass.
+    ("DATE_TIME",     r"\b(?:(?:0?[1-9]|[12]\d|3[01])(?P<date_sep>[/\-])(?:0?[1-9]|[12]\d|3[01])(?P=date_sep)(?:\d{4}|\d{2})"
+                      r"|(?:0?[1-9]|[12]\d|3[01])\.(?:0?[1-9]|1[0-2])\.\d{4}"
+                      r"|\d{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|[12]\d|3[01]))\b", 0.5),
+    ("CREDIT_CARD",   r"\b(?:\d[ \-]?){12,18}\d\b", 0.6),
+    ("IBAN_CODE",     r"(?-i:\b[A-Z]{2}\d{2}[ ]?(?:[A-Z0-9]{4}[ ]?){2,7}[A-Z0-9]{1,4}\b)", 0.6),
+    # A phone number needs structure: a +country code, an (area) code, or
+    # three groups split by one repeated separator. Bare 7-10 digit figures
+    # ("1234567 units") and year ranges are left to NER.
+    ("PHONE_NUMBER",  r"(?<![\w/.])(?:\+\d{1,3}[\s.\-]?(?:\(\d{2,5}\)[\s.\-]?|\d{2,5}[\s.\-]?)?\d{3,5}[\s.\-]?\d{4,5}"
+                      r"|\(\d{2,5}\)[\s.\-]?\d{3,5}[\s.\-]?\d{4,5}"
+                      r"|\d{2,5}(?P<phone_sep>[ .\-])\d{3,5}(?P=phone_sep)\d{4,5})(?![\w/.])", 0.4),
+]
+# One alternation, one pass per text. Flags match Presidio's PatternRecognizer.
+_FAST_SCANNER = re.compile(
+    "|".join(f"(?P<{e}>{rx})" for e, rx, _score in _FAST_PATTERNS),
+    re.IGNORECASE | re.MULTILINE | re.DOTALL,
+)
+_FAST_SCORES = {e: score for e, _rx, score in _FAST_PATTERNS}
+
+# Cheap signal that a line may hold a person or place name: honorifics,
+# "First [M.] Last" pairs, address words and party/role labels.
+_NER_HINT = re.compile(
+    r"\b(?:Mr|Mrs|Ms|Miss|Dr|Prof|Shri|Smt)\.?\s+[A-Z]"
+    r"|\b[A-Z][a-z]+(?:\s+[A-Z]\.)?\s+[A-Z][a-z]+\b"
+    r"|(?i:\b(?:street|st\.|road|rd\.|avenue|lane|nagar|city|district|county|province|address)\b)"
+    r"|(?i:\b(?:name|tenant|landlord|lessor|lessee|employee|employer|student|party|signed by|witness)\s*[:\-])"
+)
+
+
+def _recognizer_version() -> str:
+    """Changes whenever anything that affects redaction output changes."""
+    try:
+        from importlib.metadata import version
+
+        libs = [version("presidio_analyzer"), version("presidio_anonymizer"), version("en_core_web_sm")]
+    except Exception:
+        libs = []
+    spec = json.dumps([_CUSTOM_PATTERNS, _FAST_PATTERNS, _NER_HINT.pattern, libs], ensure_ascii=False)
+    return hashlib.sha256(spec.encode("utf-8")).hexdigest()[:16]
+
+
+RECOGNIZER_VERSION = _recognizer_version()
+
+
+def _rss_mb() -> float:
+    """Current resident set size of this process in MiB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+
+        # Peak rather than current RSS, but the best we have off Linux.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except Exception:
+        return 0.0
+
+
+def init_pii():
+    """Initialize Presidio once; subsequent calls are no-ops."""
+    if _analyzer is not None:
+        return
+    with _init_lock:
+        if _analyzer is None:
+            _load_engine()
+
+
+def _load_engine():
+    global _analyzer, _anonymizer, _batch_analyzer
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    try:
+        from presidio_analyzer import AnalyzerEngine, BatchAnalyzerEngine, Pattern as _P, PatternRecognizer
+        from presidio_anonymizer import AnonymizerEngine
+        from presidio_analyzer.nlp_engine import NlpEngineProvider
+
+        _provider = NlpEngineProvider(nlp_configuration={
+            "nlp_engine_name": "spacy",
+            "models": [{"lang_code": "en", "model_name": "en_core_web_sm"}],
+        })
+        analyzer = AnalyzerEngine(nlp_engine=_provider.create_engine())
+
+        for _entity, _name, _regex, _score in _CUSTOM_PATTERNS:
+            analyzer.registry.add_recognizer(
+                PatternRecognizer(
+                    supported_entity=_entity,
+                    patterns=[_P(_name, _regex, _score)],
+                )
+            )
+
+        _anonymizer = AnonymizerEngine()
+        _batch_analyzer = BatchAnalyzerEngine(analyzer_engine=analyzer)
+        # Publish last so concurrent callers never see a half-built engine.
+        _analyzer = analyzer
+
+        ENGINE_STATS.update({
+            "ready": True,
+            "load_seconds": round(time.perf_counter() - started, 3),
+            "rss_mb": round(_rss_mb(), 1),
+            "rss_delta_mb": round(_rss_mb() - rss_before, 1),
+            "pid": os.getpid(),
+        })
+        print(f"PII engine initialized: {json.dumps(ENGINE_STATS)}")
+    except Exception as e:
+        ENGINE_STATS.update({"ready": False, "error": f"{type(e).__name__}: {e}"})
+        print(f"PII engine init failed: {e}")
+
+
+def warm_up() -> dict:
+    """Load the engine and run one analysis so spaCy's lazy state is built."""
+    init_pii()
+    if _analyzer is not None:
+        started = time.perf_counter()
+        redact_pii("Contact John Smith at john.smith@example.com.")
+        ENGINE_STATS["first_call_seconds"] = round(time.perf_counter() - started, 3)
+        ENGINE_STATS["rss_mb"] = round(_rss_mb(), 1)
+    return dict(ENGINE_STATS)
+
+
+def _get_anonymizer():
+    """Presidio's anonymizer on its own; it needs no spaCy model."""
+    global _anonymizer
+    if _anonymizer is None:
+        from presidio_anonymizer import AnonymizerEngine
+
+        _anonymizer = AnonymizerEngine()
+    return _anonymizer
+
+
+def _redact_fast(text: str) -> str:
+    """Regex-scanner-only redaction, for when the NER engine is unavailable."""
+    try:
+        return _get_anonymizer().anonymize(text=text, analyzer_results=_fast_results(text)).text
+    except Exception:
+        return text
+
+
+def redact_pii(text) -> str:
+    """Redact PII from text, initialising the engine on first use."""
+    init_pii()
+    text = str(text)
+    if _analyzer is None or _anonymizer is None:
+        return _redact_fast(text)
+    try:
+        results = _analyzer.analyze(text=text, entities=_PII_ENTITIES, language="en")
+        return _anonymizer.anonymize(text=text, analyzer_results=results).text
+    except Exception:
+        return text
+
+
+def tier_for(domain: str) -> str:
+    """Redaction tier for an agent type ("legal", "finance", ...)."""
+    return PII_TIERS.get((domain or "general").lower(), "full")
+
+
+def tier_suffix(domain: str) -> str:
+    """
+    Index-key suffix for *domain*'s redaction tier ("-full", "-tiered", ...).
+    Indexes are shared across users and agents, so a document redacted under
+    one tier is never served to an agent that needs another.
+    """
+    return f"-{tier_for(domain)}"
+
+
+def _luhn_ok(digits: str) -> bool:
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        d = int(ch)
+        if i % 2:
+            d = d * 2 - 9 if d > 4 else d * 2
+        total += d
+    return total % 10 == 0
+
+
+def _fast_results(text: str) -> list:
+    """Single-pass regex scan for the pattern-based entities."""
+    from presidio_analyzer import RecognizerResult
+
+    results = []
+    for m in _FAST_SCANNER.finditer(text):
+        entity = m.lastgroup
+        if entity == "CREDIT_CARD" and not _luhn_ok(re.sub(r"\D", "", m.group())):
+            continue
+        results.append(RecognizerResult(entity, m.start(), m.end(), _FAST_SCORES[entity]))
+    return results
+
+
+def _flagged_spans(text: str, fast: list) -> list:
+    """Runs of consecutive lines that should go through NER, as (start, end)."""
+    hits = sorted(r.start for r in fast)
+    spans = []
+    pos = 0
+    for line in text.splitlines(keepends=True):
+        end = pos + len(line)
+        flagged = bool(_NER_HINT.search(line)) or any(pos <= h < end for h in hits)
+        if flagged:
+            if spans and spans[-1][1] == pos:
+                spans[-1] = (spans[-1][0], end)
+            else:
+                spans.append((pos, end))
+        pos = end
+    return spans
+
+
+def analyze_batch(texts: list, tier: str = "full", batch_size: int = PII_BATCH_SIZE) -> list:
+    """Presidio RecognizerResults for each text under the given *tier*."""
+    if tier == "full":
+        return list(_batch_analyzer.analyze_iterator(
+            texts, language="en", batch_size=batch_size, entities=_PII_ENTITIES
+        ))
+    from presidio_analyzer import RecognizerResult
+
+    results = [_fast_results(t) for t in texts]
+    if tier == "fast":
+        return results
+
+    segments = [
+        (i, start, texts[i][start:end])
+        for i in range(len(texts))
+        for start, end in _flagged_spans(texts[i], results[i])
+    ]
+    ner = _batch_analyzer.analyze_iterator(
+        [seg for _i, _start, seg in segments],
+        language="en", batch_size=batch_size, entities=_PII_ENTITIES,
+    )
+    for (i, offset, _seg), seg_results in zip(segments, ner):
+        results[i].extend(
+            RecognizerResult(r.entity_type, r.start + offset, r.end + offset, r.score)
+            for r in seg_results
+        )
+    return results
+
+
+def redact_pii_batch(texts, batch_size: int = PII_BATCH_SIZE, tier: str = "full") -> list:
+    """
+    Redact a list of page or chunk texts in one pass.
+
+    Texts are fed through spaCy's ``nlp.pipe`` in batches of *batch_size*
+    (via Presidio's BatchAnalyzerEngine) instead of one forward pass each.
+    *tier* selects how much of the text reaches NER; see PII_TIERS.
+    """
+    texts = [str(t) for t in texts]
+    if not texts:
+        return texts
+
+    # Texts seen before (same tier, entities and recognizers) come straight
+    # from the on-disk cache; only the misses reach Presidio.
+    context = f"{tier}|{','.join(_PII_ENTITIES)}|{RECOGNIZER_VERSION}"
+    keys = [redaction_cache.make_key(t, context) for t in texts]
+    cached = redaction_cache.get_many(keys)
+    todo = [i for i, k in enumerate(keys) if k not in cached]
+    if not todo:
+        return [cached[k] for k in keys]
+
+    # The fast tier is regex-only, so it never loads spaCy. Without spaCy
+    # every other tier degrades to the regex scanner rather than passing
+    # text through unredacted. Degraded output is not cached, so a later
+    # process with a working engine redacts it properly.
+    degraded = False
+    if tier != "fast":
+        init_pii()
+        degraded = _batch_analyzer is None
+        if degraded:
+            tier = "fast"
+    try:
+        anonymizer = _get_anonymizer()
+    except Exception:
+        return [cached.get(k, t) for k, t in zip(keys, texts)]
+    pending = [texts[i] for i in todo]
+    try:
+        results = analyze_batch(pending, tier, batch_size)
+    except Exception:
+        results = None
+
+    fresh: dict = {}
+    for n, i in enumerate(todo):
+        text = texts[i]
+        if results is None:
+            cached[keys[i]] = _redact_fast(text) if tier == "fast" else redact_pii(text)
+            continue
+        try:
+            cached[keys[i]] = fresh[keys[i]] = anonymizer.anonymize(
+                text=text, analyzer_results=results[n]
+            ).text
+        except Exception:
+            cached[keys[i]] = text
+    if not degraded:
+        redaction_cache.put_many(fresh)
+    return [cached[k] for k in keys]
+
+
+def redact_pii_safe(text: str) -> str:
+    """
+    Redact PII from text while preserving valid JSON arrays.
+    """
+
+    def find_json_arrays(s):
+        positions = []
+        stack = []
+        in_string = False
+        escape = False
+
+        for i, ch in enumerate(s):
+            if ch == '"' and not escape:
+                in_string = not in_string
+            elif ch == '\\' and in_string:
+                escape = not escape
+                continue
+            else:
+                escape = False
+
+            if in_string:
+                continue
+
+            if ch == '[':
+                stack.append(i)
+            elif ch == ']' and stack:
+                start = stack.pop()
+                if not stack:  # top-level candidate
+                    candidate = s[start:i+1]
+                    try:
+                        parsed = json.loads(candidate)
+                        if isinstance(parsed, list):
+                            positions.append((start, i+1))
+                    except:
+                        pass
+
+        return positions
+
+    arrays = find_json_arrays(text)
+
+    if not arrays:
+        return redact_pii(text)
+
+    result = []
+    last = 0
+
+    for start, end in arrays:
+        # redact before
+        result.append(redact_pii(text[last:start]))
+        # keep JSON intact
+        result.append(text[start:end])
+        last = end
+
+    # redact remaining
+    result.append(redact_pii(text[last:]))
+
+    return ''.join(result)
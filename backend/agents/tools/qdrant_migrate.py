@@ -0,0 +1,96 @@
+"""
+Move per-document Qdrant collections into the shared layout.
+
+Every ``papermind_docs_<name>_<sha256>-<tier>`` collection is copied,
+vectors and all (nothing is re-embedded), into its shared collection. The
+"<sha256>-<tier>" key is added to each point's metadata as doc_hash and the
+document is marked complete. Documents that
+are already complete in the shared layout are skipped. Pass --delete to drop
+each source collection once it has been copied.
+
+    python -m tools.qdrant_migrate --dry-run
+    QDRANT_SHARDS=4 python -m tools.qdrant_migrate --delete
+"""
+import argparse
+import json
+import re
+
+from tools import QdrantRAG
+
+# Collections named before the redaction tier joined the key (no "-full" /
+# "-tiered" / "-fast") are left alone: their tier is unknown, and the next
+# question about the document rebuilds them.
+_SOURCE = re.compile(rf"^{QdrantRAG._COLLECTION_PREFIX}_.*_([0-9a-f]{{64}}-(?:full|tiered|fast))(?:-d\d+)?$")
+
+
+def migrate_collection(client, name: str, doc_hash: str, batch: int = 256,
+                       dry_run: bool = False, delete: bool = False) -> dict:
+    from qdrant_client.models import FilterSelector, PointStruct
+
+    dest = QdrantRAG.shared_collection(doc_hash)
+    result = {"source": name, "dest": dest, "points": client.count(name, exact=True).count}
+    if dry_run:
+        return result
+
+    size = client.get_collection(name).config.params.vectors.size
+    QdrantRAG.ensure_shared_collection(client, dest, size)
+    dest_size = client.get_collection(dest).config.params.vectors.size
+    if dest_size != size:  # e.g. a full-size collection vs EMBEDDING_DIM
+        result["skipped"] = f"dimension {size} != {dest} dimension {dest_size}"
+        return result
+    done = client.count(dest, count_filter=QdrantRAG.doc_filter(doc_hash), exact=True).count
+    if done:
+        result["skipped"] = "already migrated"
+    else:
+        client.delete(dest, points_selector=FilterSelector(
+            filter=QdrantRAG.doc_filter(doc_hash, complete_only=False)))
+        offset, ordinal = None, 0
+        while True:
+            points, offset = client.scroll(name, limit=batch, offset=offset,
+                                           with_payload=True, with_vectors=True)
+            moved = []
+            for p in points:
+                payload = dict(p.payload or {})
+                metadata = dict(payload.get("metadata") or {})
+                chunk_id = metadata.get("chunk_id", ordinal)
+                metadata.update(doc_hash=doc_hash, chunk_id=chunk_id)
+                payload["metadata"] = metadata
+                payload.pop("complete", None)
+                moved.append(PointStruct(id=QdrantRAG.point_id(doc_hash, chunk_id),
+                                         vector=p.vector, payload=payload))
+                ordinal += 1
+            if moved:
+                client.upsert(dest, points=moved)
+            if offset is None:
+                break
+        QdrantRAG.mark_complete(client, dest, doc_hash)
+        result["migrated"] = ordinal
+
+    if delete:
+        client.delete_collection(name)
+        result["deleted"] = True
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--delete", action="store_true", help="drop source collections after copying")
+    parser.add_argument("--batch", type=int, default=256, help="points per scroll/upsert")
+    args = parser.parse_args()
+
+    client = QdrantRAG._init_qdrant()
+    if client is None:
+        raise SystemExit(1)
+    results = []
+    for c in client.get_collections().collections:
+        m = _SOURCE.match(c.name)
+        if m:
+            results.append(migrate_collection(client, c.name, m.group(1), args.batch,
+                                              args.dry_run, args.delete))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
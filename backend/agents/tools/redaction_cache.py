@@ -0,0 +1,151 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# ── On-disk redaction memo ────────────────────────────────────────────────────
+# redact_pii output keyed by (text hash, tier, entity list, recognizer
+# version), so re-indexing an unchanged document skips Presidio entirely.
+# SQLite keeps it safe to share between the API process and the ingestion
+# pool workers. Entries are evicted least-recently-used once the stored text
+# exceeds REDACTION_CACHE_MAX_MB (0 disables the cache).
+_HERE = os.path.dirname(os.path.abspath(__file__))
+REDACTION_CACHE_PATH = os.getenv(
+    "REDACTION_CACHE_PATH", os.path.join(_HERE, "redaction_cache.db")
+)
+REDACTION_CACHE_MAX_BYTES = int(float(os.getenv("REDACTION_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+_conn = None
+_conn_pid = None
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return REDACTION_CACHE_MAX_BYTES > 0
+
+
+def _connect() -> sqlite3.Connection:
+    """One connection per process (pool workers are separate processes)."""
+    global _conn, _conn_pid
+    if _conn is None or _conn_pid != os.getpid():
+        conn = sqlite3.connect(REDACTION_CACHE_PATH, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_access)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        conn.commit()
+        _conn, _conn_pid = conn, os.getpid()
+    return _conn
+
+
+def make_key(text: str, context: str) -> str:
+    """*context* identifies tier, entity list and recognizer version."""
+    h = hashlib.sha256(context.encode("utf-8"))
+    h.update(b"\0")
+    h.update(text.encode("utf-8", "surrogatepass"))
+    return h.hexdigest()
+
+
+def _bump(conn, **counts):
+    conn.executemany(
+        "INSERT INTO counters(name, value) VALUES(?, ?)"
+        " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        [(k, v) for k, v in counts.items() if v],
+    )
+
+
+def get_many(keys: list) -> dict:
+    """Return {key: redacted text} for the keys that are cached."""
+    if not enabled() or not keys:
+        return {}
+    found: dict = {}
+    try:
+        with _lock:
+            conn = _connect()
+            unique = list(dict.fromkeys(keys))
+            for i in range(0, len(unique), 500):
+                batch = unique[i:i + 500]
+                marks = ",".join("?" * len(batch))
+                found.update(conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({marks})", batch
+                ).fetchall())
+            if found:
+                conn.executemany(
+                    "UPDATE entries SET last_access = ? WHERE key = ?",
+                    [(time.time(), k) for k in found],
+                )
+            hits = sum(1 for k in keys if k in found)
+            _bump(conn, hits=hits, misses=len(keys) - hits)
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"Redaction cache read failed: {e}")
+        return {}
+    return found
+
+
+def put_many(items: dict):
+    """Store {key: redacted text}, then evict LRU entries over budget."""
+    if not enabled() or not items:
+        return
+    now = time.time()
+    try:
+        with _lock:
+            conn = _connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO entries(key, value, size, last_access) VALUES(?, ?, ?, ?)",
+                [(k, v, len(v.encode("utf-8", "surrogatepass")), now) for k, v in items.items()],
+            )
+            _evict(conn)
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"Redaction cache write failed: {e}")
+
+
+def _evict(conn):
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    if total <= REDACTION_CACHE_MAX_BYTES:
+        return
+    # Trim to 90% of the budget so we don't evict on every insert.
+    target = total - int(REDACTION_CACHE_MAX_BYTES * 0.9)
+    freed, victims = 0, []
+    for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+        victims.append((key,))
+        freed += size
+        if freed >= target:
+            break
+    conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+    _bump(conn, evictions=len(victims))
+
+
+def stats() -> dict:
+    """Hit/miss/eviction counters (all processes) and current size."""
+    if not enabled():
+        return {"enabled": False}
+    try:
+        with _lock:
+            conn = _connect()
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+    except sqlite3.Error as e:
+        return {"enabled": True, "error": str(e)}
+    hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+    return {
+        "enabled": True,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "evictions": counters.get("evictions", 0),
+        "entries": entries,
+        "bytes": size,
+        "budget_bytes": REDACTION_CACHE_MAX_BYTES,
+    }
@@ -0,0 +1,59 @@
+import os
+import threading
+from contextlib import contextmanager
+
+# ── Single-flight index builds ────────────────────────────────────────────────
+# One build per document at a time: threads in this process queue on an
+# in-process lock, other worker processes on a file lock in BUILD_LOCK_DIR.
+# Callers re-check their cache after acquiring, so whoever waited picks up
+# the finished index instead of building (and paying for embeddings) again.
+_HERE = os.path.dirname(os.path.abspath(__file__))
+BUILD_LOCK_DIR = os.getenv("BUILD_LOCK_DIR", os.path.join(_HERE, "build_locks"))
+BUILD_LOCK_TIMEOUT_S = float(os.getenv("BUILD_LOCK_TIMEOUT_S", "1800"))
+
+_locks: dict = {}  # key -> [threading.Lock, users]
+_locks_guard = threading.Lock()
+
+
+@contextmanager
+def build_lock(key: str, timeout: float = None):
+    """Hold the build lock for *key* (a document hash or collection name)."""
+    from filelock import FileLock
+
+    timeout = BUILD_LOCK_TIMEOUT_S if timeout is None else timeout
+    with _locks_guard:
+        entry = _locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        if not entry[0].acquire(timeout=timeout if timeout > 0 else -1):
+            raise TimeoutError(f"Timed out waiting for the build of {key[:16]}")
+        try:
+            os.makedirs(BUILD_LOCK_DIR, exist_ok=True)
+            with FileLock(os.path.join(BUILD_LOCK_DIR, f"{key}.lock"), timeout=timeout if timeout > 0 else -1):
+                yield
+        finally:
+            entry[0].release()
+    finally:
+        with _locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _locks.pop(key, None)
+
+
+def is_building(key: str) -> bool:
+    """True while some thread or worker holds the build lock for *key*."""
+    from filelock import FileLock, Timeout
+
+    with _locks_guard:
+        if key in _locks:
+            return True
+    path = os.path.join(BUILD_LOCK_DIR, f"{key}.lock")
+    if not os.path.exists(path):
+        return False
+    lock = FileLock(path, timeout=0)
+    try:
+        lock.acquire()
+    except Timeout:
+        return True
+    lock.release()
+    return False
@@ -0,0 +1,106 @@
+"""
+Content-addressed upload store.
+
+Uploads are written once, as ``<sha256><ext>`` under BLOB_DIR, with the hash
+computed while the bytes stream in. Sessions keep references (the blob path
+plus the original filename) instead of private copies, so the same document
+uploaded by many users costs one file and one index, and the RAG tools can
+read the document hash straight from the blob name.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from typing import BinaryIO, NamedTuple
+
+from dotenv import load_dotenv
+
+load_dotenv()  # limits and BLOB_DIR are read at import
+
+# `or`, not a getenv default: env.example ships BLOB_DIR= empty.
+BLOB_DIR = os.getenv("BLOB_DIR") or os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "uploaded_files", "blobs")
+)
+COPY_CHUNK_BYTES = 1024 * 1024
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "100")) * 1024 * 1024)
+# Whole multipart request, checked against Content-Length before the body is
+# read. Defaults to one file at the per-file limit plus room for the form
+# fields, so an oversized single file is refused without being spooled;
+# raise it to allow several large files in one request.
+_FORM_SLACK_BYTES = 1024 * 1024
+MAX_REQUEST_BYTES = int(float(os.getenv("MAX_REQUEST_MB") or 0) * 1024 * 1024) or (
+    MAX_UPLOAD_BYTES + _FORM_SLACK_BYTES if MAX_UPLOAD_BYTES else 0
+)
+
+_BLOB_NAME_RE = re.compile(r"^([0-9a-f]{64})(\.[A-Za-z0-9]{1,10})?$")
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the size limit; nothing is kept on disk."""
+
+    def __init__(self, size: int, limit: int):
+        super().__init__(f"upload of {size}+ bytes exceeds the {limit}-byte limit")
+        self.size = size
+        self.limit = limit
+
+
+class StoredBlob(NamedTuple):
+    sha256: str
+    path: str
+    size: int
+    deduplicated: bool
+
+
+def _extension(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if re.fullmatch(r"\.[a-z0-9]{1,10}", ext) else ""
+
+
+def blob_path(sha256: str, filename: str = "") -> str:
+    return os.path.join(BLOB_DIR, sha256 + _extension(filename))
+
+
+def hash_from_path(path: str):
+    """SHA-256 encoded in a blob path, or None for files outside the store."""
+    if os.path.dirname(os.path.abspath(path)) != os.path.abspath(BLOB_DIR):
+        return None
+    m = _BLOB_NAME_RE.match(os.path.basename(path))
+    return m.group(1) if m else None
+
+
+def save_stream(src: BinaryIO, filename: str, max_bytes: int = None) -> StoredBlob:
+    """
+    Copy *src* into the store, hashing in the same pass. Blocking — call it
+    from a worker thread in async code.
+
+    Raises UploadTooLarge as soon as more than *max_bytes* (default
+    MAX_UPLOAD_BYTES, 0 = unlimited) have been read.
+
+    The bytes go to a temp file in BLOB_DIR first; if a blob with the same
+    hash already exists the temp file is dropped, otherwise it is renamed
+    into place (atomic on the same filesystem).
+    """
+    limit = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    h = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=BLOB_DIR, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for block in iter(lambda: src.read(COPY_CHUNK_BYTES), b""):
+                size += len(block)
+                if limit and size > limit:
+                    raise UploadTooLarge(size, limit)
+                h.update(block)
+                out.write(block)
+        sha = h.hexdigest()
+        dest = blob_path(sha, filename)
+        if os.path.exists(dest):
+            os.remove(tmp)
+            return StoredBlob(sha, dest, size, True)
+        os.replace(tmp, dest)
+        return StoredBlob(sha, dest, size, False)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
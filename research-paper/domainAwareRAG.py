@@ -8,6 +8,12 @@ from textstat import flesch_reading_ease
 from sklearn.metrics import precision_score, recall_score, f1_score
 from dotenv import load_dotenv
 import os
+import sys
+
+# Batched embedding and ANN index selection shared with the backend ingestion path.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "agents"))
+from tools.embedding_executor import EmbeddingExecutor
+from tools.ann import build_index
 
 from prompts import (
     build_education_prompt,
@@ -40,14 +46,19 @@ def chunk_text(text, chunk_size=600, overlap=80):
     return chunks
 
 
+def _embed_batch(texts):
+    return genai.embed_content(
+        model="models/embedding-001",
+        content=texts
+    )["embedding"]
+
+
+_embed_executor = EmbeddingExecutor(_embed_batch)
+
+
 def embed_texts(texts):
-    embeddings = []
-    for t in texts:
-        emb = genai.embed_content(
-            model="models/embedding-001",
-            content=t
-        )["embedding"]
-        embeddings.append(emb)
+    embeddings = _embed_executor.run(list(texts))
+    _embed_executor.report()
 
     embeddings = np.array(embeddings, dtype="float32")
     faiss.normalize_L2(embeddings)
@@ -57,9 +68,8 @@ def embed_texts(texts):
 class VectorStore:
     def __init__(self, embeddings, documents):
         self.documents = documents
-        dim = embeddings.shape[1]
-        self.index = faiss.IndexFlatIP(dim)
-        self.index.add(embeddings)
+        # Flat for small corpora, HNSW / IVF once chunk counts grow.
+        self.index = build_index(embeddings, faiss.METRIC_INNER_PRODUCT)
 
     def search(self, query_embedding, k=10):
         distances, indices = self.index.search(query_embedding, k)